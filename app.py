@@ -1,11 +1,32 @@
 import streamlit as st
-import openai
+import streamlit.components.v1 as components
+import io
 import os
+import json
+import hashlib
 import time
-from dotenv import load_dotenv
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
-from fpdf import FPDF
-import base64
+from study_core import metrics
+from study_core.actions import (
+    ChatSettings, complete, fit_input, focus_text, input_room, run_action, stream_complete, structure_result,
+    summarize_sections, token_counts,
+)
+from study_core.dedup import NearDuplicateIndex
+from study_core.exporters import EXPORT_FORMATS, result_pdf
+from study_core.extract import extract_text
+from study_core.history_store import HistoryRecord, HistoryStore
+from study_core.llm_backends import ChatBackend, backend_from_env
+from study_core.llm_cache import LRUCache, ResponseCache
+from study_core.parsers import LETTERS, RECORD_TYPES, VALIDATORS, JSONItemReader, QuizQuestion, records_from_text
+from study_core.prompts import build_prompt, build_roadmap_prompt
+from study_core.srs import GRADES, Deck
+from study_core.storage import KVStore, SQLiteKV, WriteBehind
+from study_core.tokens import TokenMeter, estimate_tokens, fit_to_budget
+from theme import STYLESHEET_PATH, THEME_CSS
+
+run_started = time.perf_counter()
 
 # ---------- CONFIG ----------
 st.set_page_config(
@@ -15,30 +36,145 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY", "")
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    # .env is read once per process, before the settings below are read from it.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+load_environment()
+
+@st.cache_resource(show_spinner=False)
+def start_metrics():
+    # JSON span logs (METRICS_LOG) and the Prometheus endpoint (METRICS_PORT), once per process.
+    return metrics.start_from_env()
+
+start_metrics()
+# A sidebar panel with this session's timings; off by default.
+PERF_PANEL = os.getenv("PERF_PANEL", "").lower() in ("1", "true", "yes")
+# Summaries of inputs above this size go through map-reduce over chunks of this size.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2500"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# Upper bound on extracted characters kept per upload (bounds memory for huge books).
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "2000000"))
+# Explain, Quiz and Flashcard on documents above this size only send the passages
+# that best match the topic label.
+RETRIEVAL_MIN_TOKENS = int(os.getenv("RETRIEVAL_MIN_TOKENS", "3000"))
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "300"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+# Estimated similarity above which a new card or quiz question counts as a repeat.
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+# History and stats persist here per user; set to an empty string to keep them per session only.
+HISTORY_DB = os.getenv("HISTORY_DB", "smart_study.db")
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    # One cache per process, shared by every session.
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+        db_path=os.getenv("LLM_CACHE_DB") or None,
+    )
+
+@st.cache_resource
+def get_extraction_cache() -> LRUCache:
+    # Extracted upload text keyed by a hash of the file bytes, shared by every session.
+    return LRUCache(max_entries=int(os.getenv("EXTRACT_CACHE_SIZE", "16")))
+
+@st.cache_resource
+def get_retrieval_cache() -> LRUCache:
+    # BM25 indexes keyed by a hash of the document text, shared by every session.
+    return LRUCache(max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "8")))
+
+@st.cache_resource
+def get_backend() -> ChatBackend:
+    # One model backend (and pooled client) per process, shared by every session.
+    return backend_from_env()
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    # Background work (e.g. study paths) shared by every session in the process.
+    return ThreadPoolExecutor(max_workers=int(os.getenv("BACKGROUND_WORKERS", "4")))
+
+@st.cache_resource
+def get_storage():
+    # Persistent history and stats shared by every session (and, through the
+    # database file, by every app process); writes are batched off the script thread.
+    if not HISTORY_DB:
+        return None
+    return WriteBehind(SQLiteKV(HISTORY_DB), interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5")))
+
+def get_user_id() -> str:
+    # The id lives in the URL (?user=...), so a refresh or a bookmark finds the same history.
+    user_id = st.query_params.get("user")
+    if not user_id:
+        user_id = uuid.uuid4().hex[:16]
+        st.query_params["user"] = user_id
+    return user_id
+
+def load_stats(storage: KVStore, namespace: str) -> dict:
+    stats = dict.fromkeys(["summaries", "explanations", "quizzes", "flashcards", "total"], 0)
+    if storage is not None:
+        prefix = f"{namespace}stats:"
+        for key, value in storage.scan(prefix):
+            stats[key[len(prefix):]] = int(value)
+    return stats
 
 # ---------- SESSION ----------
 ss = st.session_state
 
+if "user_ns" not in ss:
+    ss.user_ns = f"user:{get_user_id()}:" if get_storage() is not None else ""
 if "history" not in ss:
-    ss.history = []
+    # Only the entry count is read here; bodies load when they are shown.
+    ss.history = HistoryStore(
+        hot_size=int(os.getenv("HISTORY_HOT_SIZE", "50")),
+        hot_bytes=int(os.getenv("HISTORY_HOT_BYTES", str(8 * 1024 * 1024))),
+        kv=get_storage(),
+        namespace=ss.user_ns,
+    )
 if "stats" not in ss:
-    ss.stats = {
-        "summaries": 0,
-        "explanations": 0,
-        "quizzes": 0,
-        "flashcards": 0,
-        "total": 0,
-    }
+    ss.stats = load_stats(get_storage(), ss.user_ns)
+if "deck" not in ss:
+    # Flashcard review deck and a near-duplicate index of quiz questions; without
+    # persistent storage they live for the session only.
+    kv = get_storage() or SQLiteKV(":memory:")
+    ss.deck = Deck(kv, ss.user_ns, dedup=NearDuplicateIndex(kv, f"{ss.user_ns}dup-cards:", threshold=DEDUP_THRESHOLD))
+    ss.quiz_index = NearDuplicateIndex(kv, f"{ss.user_ns}dup-questions:", threshold=DEDUP_THRESHOLD)
+if "reviewing" not in ss:
+    ss.reviewing = False
+if "review_queue" not in ss:
+    ss.review_queue = []  # ids of due cards fetched from the deck, next first
+if "review_revealed" not in ss:
+    ss.review_revealed = False
+if "token_usage" not in ss:
+    ss.token_usage = TokenMeter()  # estimated tokens of every model call this session
+if "metrics" not in ss:
+    ss.metrics = metrics.SessionMetrics(uuid.uuid4().hex[:8])  # timings of this session's spans
+metrics.use_session(ss.metrics)
 if "last_output" not in ss:
     ss.last_output = ""
 if "last_action" not in ss:
     ss.last_action = ""
 if "last_input" not in ss:
     ss.last_input = ""
+if "last_entry_id" not in ss:
+    ss.last_entry_id = None
+if "last_pack" not in ss:
+    ss.last_pack = None  # {"entries": {action: history id}, "total": seconds, "notes": budget notes}
+if "pdf_exports" not in ss:
+    ss.pdf_exports = {}  # export key -> PDF bytes, or Future while building
+if "history_exports" not in ss:
+    ss.history_exports = {}  # (format, history length) -> bytes, or Future while building
+if "roadmap_jobs" not in ss:
+    ss.roadmap_jobs = {}  # history entry id -> Future
 if "uploaded_text" not in ss:
     ss.uploaded_text = ""
+if "uploaded_tokens" not in ss:
+    ss.uploaded_tokens = 0
+if "upload_key" not in ss:
+    ss.upload_key = None  # (file id, page range) of the upload already extracted
 if "theme" not in ss:
     ss.theme = "light"
 
@@ -54,526 +190,74 @@ if "pomo_focus_len" not in ss:
 if "pomo_break_len" not in ss:
     ss.pomo_break_len = 5
 
-# ---------- THEME CSS ----------
-LIGHT_CSS = """
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap');
-
-html, body, [class*="css"] {
-    font-family: 'Poppins', sans-serif;
-}
-.block-container {
-    padding-top: 1.5rem !important;
-    padding-bottom: 1.5rem !important;
-}
-.app-shell {
-    max-width: 1180px;
-    margin: 0 auto;
-}
-
-/* Light theme placeholders */
-.stTextArea textarea::placeholder,
-.stTextInput input::placeholder {
-    color: #9ca3af !important;   /* soft gray */
-    opacity: 1 !important;
-}
-
-
-/* Topbar */
-.topbar {
-    background: #ffffff;
-    border-radius: 18px;
-    padding: 0.85rem 1.4rem;
-    border: 1px solid rgba(148,163,184,0.28);
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    box-shadow: 0 14px 38px rgba(15,23,42,0.06);
-    margin-bottom: 1.6rem;
-}
-.brand {
-    display: flex;
-    gap: .7rem;
-    align-items: center;
-}
-.brand-icon {
-    width: 28px;
-    height: 28px;
-    border-radius: 9px;
-    background: linear-gradient(135deg,#4f46e5,#22c55e);
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    color: #ffffff;
-    font-size: 16px;
-}
-.brand-title {
-    font-weight: 700;
-    font-size: 1.05rem;
-    color: #111827;
-}
-.brand-sub {
-    font-size: .7rem;
-    color: #9ca3af;
-}
-
-.nav-links {
-    display: flex;
-    gap: .4rem;
-    align-items: center;
-}
-.nav-pill {
-    padding: .3rem .85rem;
-    border-radius: 999px;
-    font-size: .72rem;
-    color: #6b7280;
-    background: transparent;
-    border: 1px solid transparent;
-    cursor: pointer;
-}
-.nav-pill:hover {
-    color: #4f46e5;
-    border-color: rgba(79,70,229,0.18);
-    background: rgba(249,250,251,0.9);
-}
-.nav-pill.active {
-    color: #4f46e5;
-    background: #eef2ff;
-    border-color: rgba(79,70,229,0.35);
-    font-weight: 600;
-}
-
-/* Hero */
-.hero-title {
-    font-size: 2.2rem;
-    font-weight: 700;
-    letter-spacing: -0.01em;
-    background: linear-gradient(120deg,#4f46e5 0%,#7c3aed 40%,#f97316 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    margin-bottom: .15rem;
-}
-.hero-sub {
-    font-size: .9rem;
-    color: #6b7280;
-    max-width: 520px;
-}
-
-/* Cards */
-.input-card,
-.side-card,
-.result-card {
-    background: #ffffff;
-    border-radius: 18px;
-    border: 1px solid rgba(226,232,240,0.95);
-    box-shadow: 0 10px 26px rgba(15,23,42,0.03);
-}
-.input-card {
-    padding: 1rem 1rem .9rem;
-}
-.side-card {
-    padding: .85rem .9rem .9rem;
-    margin-bottom: .8rem;
-}
-.result-card {
-    padding: 1rem 1rem 1.25rem;
-    margin-top: .5rem;
-}
-
-/* File uploader */
-[data-testid="stFileUploader"] section {
-    border-radius: 14px;
-    border: 1px dashed rgba(148,163,184,0.6);
-    background: #f9fafb;
-}
-
-/* Text area */
-.stTextArea textarea {
-    border-radius: 14px !important;
-    border: 1px solid #e5e7eb !important;
-    font-size: .85rem !important;
-    background: #f9fafb !important;
-    padding: .7rem .8rem !important;
-}
-.stTextArea textarea:focus {
-    border-color: #4f46e5 !important;
-    box-shadow: 0 0 0 1px rgba(79,70,229,0.12);
-    background: #ffffff !important;
-}
 
-/* Buttons */
-.stButton button {
-    border-radius: 999px !important;
-    font-weight: 600 !important;
-    font-size: .78rem !important;
-    padding: 0.35rem 0.4rem !important;
-    border: none !important;
-    background: linear-gradient(135deg,#4f46e5,#7c3aed) !important;
-    color: #ffffff !important;
-    box-shadow: 0 9px 22px rgba(79,70,229,0.25);
-    transition: all .18s ease-in-out;
-}
-.stButton button:hover {
-    transform: translateY(-1px);
-    box-shadow: 0 14px 30px rgba(79,70,229,0.32);
-}
-.stButton button:active {
-    transform: translateY(1px);
-    box-shadow: 0 6px 16px rgba(79,70,229,0.2);
-}
+# ---------- POMODORO ----------
+POMO_FOCUS_DONE = "Focus session complete. Break started! 🌿"
+POMO_BREAK_DONE = "Break finished. Back to focus when you're ready ✨"
 
-/* Badges & history */
-.badge {
-    display: inline-flex;
-    align-items: center;
-    gap: .25rem;
-    padding: .22rem .7rem;
-    border-radius: 999px;
-    background: rgba(79,70,229,0.06);
-    color: #4338ca;
-    font-size: .7rem;
-    font-weight: 600;
-    margin-bottom: .4rem;
-}
-.stat-grid {
-    display: grid;
-    grid-template-columns: repeat(2, minmax(0,1fr));
-    gap: .5rem;
-}
-.stat-item {
-    padding: .5rem .55rem;
-    border-radius: 12px;
-    border: 1px solid rgba(229,231,235,1);
-    background: linear-gradient(180deg,#ffffff,#f9fafb);
-}
-.stat-title {
-    font-size: .6rem;
-    color: #9ca3af;
-}
-.stat-value {
-    font-size: 1.05rem;
-    font-weight: 700;
-    color: #111827;
-}
-.history-item {
-    padding: .45rem .5rem;
-    border-radius: 10px;
-    background: #f9fafb;
-    border: 1px solid rgba(229,231,235,1);
-    margin-bottom: .34rem;
-}
-.history-type {
-    font-size: .7rem;
-    font-weight: 600;
-    color: #111827;
-}
-.history-time {
-    font-size: .6rem;
-    color: #9ca3af;
-}
-.history-tag {
-    font-size: .58rem;
-    color: #6b7280;
-    font-style: italic;
-}
+def advance_pomodoro(now: datetime) -> list:
+    """Apply any Focus→Break→stop transitions that happened since the last rerun.
 
-/* Footer */
-.footer {
-    text-align: center;
-    color: #9ca3af;
-    font-size: .7rem;
-    padding-top: 1.2rem;
-}
-
-/* Anim */
-@keyframes fadeIn {
-    from { opacity: 0; transform: translateY(4px); }
-    to { opacity: 1; transform: translateY(0); }
-}
-</style>
-"""
-
-DARK_CSS = """
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap');
-
-:root {
-    color-scheme: dark;
-}
-
-html, body, [class*="css"] {
-    font-family: 'Poppins', sans-serif;
-}
-
-/* Core backgrounds */
-.stApp {
-    background-color: #020817 !important;
-}
-[data-testid="stAppViewContainer"] {
-    background: radial-gradient(circle at top,#020817,#020817) !important;
-}
-.block-container {
-    padding-top: 1.5rem !important;
-    padding-bottom: 1.5rem !important;
-}
-.app-shell {
-    max-width: 1180px;
-    margin: 0 auto;
-}
-
-/* Dark theme placeholders */
-.stTextArea textarea::placeholder,
-.stTextInput input::placeholder {
-    color: #6b7280 !important;   /* visible but subtle */
-    opacity: 1 !important;
-}
-
-/* File uploader helper text */
-[data-testid="stFileUploader"] *::placeholder {
-    color: #6b7280 !important;
-}
-
-
-/* Sidebar */
-[data-testid="stSidebar"] {
-    background: #020817 !important;
-    box-shadow: 4px 0 26px rgba(0,0,0,0.55);
-    border-right: 1px solid #111827;
-}
-[data-testid="stSidebar"] * {
-    color: #e5e7eb !important;
-}
-
-/* Topbar */
-.topbar {
-    background: radial-gradient(circle at top left,#0b1020,#020817);
-    border-radius: 18px;
-    padding: 0.85rem 1.4rem;
-    border: 1px solid rgba(75,85,99,0.9);
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    box-shadow: 0 18px 40px rgba(0,0,0,0.9);
-    margin-bottom: 1.6rem;
-}
-.brand {
-    display: flex;
-    gap: .7rem;
-    align-items: center;
-}
-.brand-icon {
-    width: 28px;
-    height: 28px;
-    border-radius: 9px;
-    background: linear-gradient(135deg,#4f46e5,#22c55e);
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    color: #ffffff;
-    font-size: 16px;
-}
-.brand-title {
-    font-weight: 700;
-    font-size: 1.05rem;
-    color: #e5e7eb;
-}
-.brand-sub {
-    font-size: .7rem;
-    color: #9ca3af;
-}
-.nav-links {
-    display: flex;
-    gap: .4rem;
-    align-items: center;
-}
-.nav-pill {
-    padding: .3rem .85rem;
-    border-radius: 999px;
-    font-size: .72rem;
-    color: #9ca3af;
-    background: transparent;
-    border: 1px solid transparent;
-    cursor: pointer;
-}
-.nav-pill:hover {
-    color: #c7d2fe;
-    border-color: rgba(79,70,229,0.4);
-    background: #020817;
-}
-.nav-pill.active {
-    color: #e5e7eb;
-    background: #111827;
-    border-color: rgba(79,70,229,0.7);
-    font-weight: 600;
-}
-
-/* Hero */
-.hero-title {
-    font-size: 2.2rem;
-    font-weight: 700;
-    letter-spacing: -0.01em;
-    background: linear-gradient(120deg,#60a5fa 0%,#a855f7 40%,#f97316 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    margin-bottom: .15rem;
-}
-.hero-sub {
-    font-size: .9rem;
-    color: #9ca3af;
-    max-width: 520px;
-}
-
-/* Cards */
-.input-card,
-.side-card,
-.result-card {
-    background: #050815;
-    border-radius: 18px;
-    border: 1px solid #111827;
-    box-shadow: 0 18px 45px rgba(0,0,0,0.9);
-}
-.input-card {
-    padding: 1rem 1rem .9rem;
-}
-.side-card {
-    padding: .85rem .9rem .9rem;
-    margin-bottom: .8rem;
-}
-.result-card {
-    padding: 1rem 1rem 1.25rem;
-    margin-top: .5rem;
-}
-
-/* File uploader */
-[data-testid="stFileUploader"] section {
-    border-radius: 14px;
-    border: 1px dashed rgba(148,163,184,0.7);
-    background: #020817;
-    color: #9ca3af;
-}
-
-/* Text area & inputs */
-.stTextArea textarea,
-.stTextInput input {
-    border-radius: 14px !important;
-    border: 1px solid #374151 !important;
-    font-size: .85rem !important;
-    background: #020817 !important;
-    color: #e5e7eb !important;
-    padding: .7rem .8rem !important;
-}
-.stTextArea textarea:focus,
-.stTextInput input:focus {
-    border-color: #6366f1 !important;
-    box-shadow: 0 0 0 1px rgba(99,102,241,0.35);
-}
-
-/* Selects, sliders, captions */
-.stSelectbox div,
-.stCaption,
-.stMarkdown,
-label {
-    color: #e5e7eb !important;
-}
-.stSlider > div[data-baseweb="slider"] > div {
-    background-color: #111827 !important;
-}
-
-/* Buttons */
-.stButton button {
-    border-radius: 999px !important;
-    font-weight: 600 !important;
-    font-size: .78rem !important;
-    padding: 0.35rem 0.4rem !important;
-    border: none !important;
-    background: linear-gradient(135deg,#4f46e5,#7c3aed) !important;
-    color: #ffffff !important;
-    box-shadow: 0 18px 55px rgba(0,0,0,1);
-    transition: all .18s ease-in-out;
-}
-.stButton button:hover {
-    transform: translateY(-1px);
-    box-shadow: 0 24px 70px rgba(0,0,0,1);
-}
-.stButton button:active {
-    transform: translateY(1px);
-    box-shadow: 0 10px 30px rgba(0,0,0,1);
-}
-
-/* Badges & stats */
-.badge {
-    display: inline-flex;
-    align-items: center;
-    gap: .25rem;
-    padding: .22rem .7rem;
-    border-radius: 999px;
-    background: rgba(79,70,229,0.25);
-    color: #e5e7eb;
-    font-size: .7rem;
-    font-weight: 600;
-    margin-bottom: .4rem;
-}
-.stat-grid {
-    display: grid;
-    grid-template-columns: repeat(2, minmax(0,1fr));
-    gap: .5rem;
-}
-.stat-item {
-    padding: .5rem .55rem;
-    border-radius: 12px;
-    border: 1px solid #111827;
-    background: radial-gradient(circle at top,#111827,#020817);
-}
-.stat-title {
-    font-size: .6rem;
-    color: #9ca3af;
-}
-.stat-value {
-    font-size: 1.05rem;
-    font-weight: 700;
-    color: #e5e7eb;
-}
-
-/* History */
-.history-item {
-    padding: .45rem .5rem;
-    border-radius: 10px;
-    background: #020817;
-    border: 1px solid #111827;
-    margin-bottom: .34rem;
-}
-.history-type {
-    font-size: .7rem;
-    font-weight: 600;
-    color: #e5e7eb;
-}
-.history-time {
-    font-size: .6rem;
-    color: #6b7280;
-}
-.history-tag {
-    font-size: .58rem;
-    color: #9ca3af;
-    font-style: italic;
-}
-
-/* Footer */
-.footer {
-    text-align: center;
-    color: #6b7280;
-    font-size: .7rem;
-    padding-top: 1.2rem;
-}
-
-/* Anim */
-@keyframes fadeIn {
-    from { opacity: 0; transform: translateY(4px); }
-    to { opacity: 1; transform: translateY(0); }
-}
-</style>
-"""
+    Phases are chained off the previous ``pomo_end`` rather than ``now`` so a
+    transition that is noticed late (the clock ticks client-side) still keeps
+    the break the configured length.
+    """
+    messages = []
+    while ss.pomo_running and ss.pomo_end and ss.pomo_end <= now:
+        if ss.pomo_mode == "Focus":
+            ss.pomo_mode = "Break"
+            ss.pomo_end = ss.pomo_end + timedelta(minutes=ss.pomo_break_len)
+            messages.append(POMO_FOCUS_DONE)
+        else:
+            ss.pomo_running = False
+            ss.pomo_end = None
+            ss.pomo_mode = "Focus"
+            messages.append(POMO_BREAK_DONE)
+    return messages
 
+def render_pomodoro_clock(now: datetime):
+    """Render a countdown that ticks in the browser instead of rerunning the script.
 
+    The remaining Focus and Break phases are handed to the client as durations
+    (not timestamps) so a skewed client clock does not shift the timer.
+    """
+    remaining_ms = int((ss.pomo_end - now).total_seconds() * 1000)
+    phases = [{"mode": ss.pomo_mode, "ms": remaining_ms}]
+    if ss.pomo_mode == "Focus":
+        phases.append({"mode": "Break", "ms": ss.pomo_break_len * 60 * 1000})
+    color = "#e5e7eb" if ss.theme == "dark" else "#111827"
+    components.html(
+        f"""
+<div id="pomo" style="font-family:'Poppins',sans-serif; font-size:1.6rem; font-weight:700;
+     text-align:center; color:{color};"></div>
+<div id="pomo-msg" style="font-family:'Poppins',sans-serif; font-size:.75rem;
+     text-align:center; color:#22c55e;"></div>
+<script>
+const phases = {json.dumps(phases)};
+const messages = {json.dumps({"Focus": POMO_FOCUS_DONE, "Break": POMO_BREAK_DONE})};
+const start = Date.now();
+function tick() {{
+  let elapsed = Date.now() - start;
+  for (const phase of phases) {{
+    if (elapsed < phase.ms) {{
+      const total = Math.ceil((phase.ms - elapsed) / 1000);
+      const mins = String(Math.floor(total / 60)).padStart(2, "0");
+      const secs = String(total % 60).padStart(2, "0");
+      document.getElementById("pomo").textContent = phase.mode + ": " + mins + ":" + secs;
+      return;
+    }}
+    elapsed -= phase.ms;
+    document.getElementById("pomo-msg").textContent = messages[phase.mode];
+  }}
+  document.getElementById("pomo").textContent = "00:00";
+  clearInterval(timer);
+}}
+const timer = setInterval(tick, 1000);
+tick();
+</script>
+""",
+        height=72,
+    )
 
 # ---------- THEME TOGGLE UI ----------
 with st.sidebar:
@@ -581,11 +265,71 @@ with st.sidebar:
     dark_toggle = st.toggle("🌙 Dark mode", value=(ss.theme == "dark"))
     ss.theme = "dark" if dark_toggle else "light"
 
-# Inject theme CSS
-if ss.theme == "dark":
-    st.markdown(DARK_CSS, unsafe_allow_html=True)
-else:
-    st.markdown(LIGHT_CSS, unsafe_allow_html=True)
+@st.cache_resource
+def get_theme_url():
+    # The compiled stylesheet (python theme.py), versioned by content so browsers
+    # keep it until it changes. None when static serving is off or it was never built.
+    if not st.get_option("server.enableStaticServing") or not os.path.exists(STYLESHEET_PATH):
+        return None
+    with open(STYLESHEET_PATH, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+    return f"app/static/theme.css?v={version}"
+
+def apply_theme(theme: str):
+    """Switch themes by flipping a class on <html>; the stylesheet is fetched once per tab."""
+    url = get_theme_url()
+    if url is None:
+        st.markdown(THEME_CSS[theme], unsafe_allow_html=True)
+        return
+    components.html(
+        f"""
+<script>
+const doc = window.parent.document;
+doc.documentElement.classList.remove("theme-light", "theme-dark");
+doc.documentElement.classList.add({json.dumps("theme-" + theme)});
+const href = new URL({json.dumps(url)}, window.parent.location.href).href;
+const current = doc.getElementById("study-theme");
+if (!current || current.dataset.href !== href) {{
+  // Streamlit serves static .css as text/plain, which a <link> would refuse, so inline it.
+  fetch(href).then((response) => response.text()).then((css) => {{
+    const style = doc.getElementById("study-theme") || doc.body.appendChild(doc.createElement("style"));
+    style.id = "study-theme";
+    style.dataset.href = href;
+    style.textContent = css;
+  }});
+}}
+</script>
+""",
+        height=0,
+    )
+
+apply_theme(ss.theme)
+
+# ---------- PERFORMANCE PANEL ----------
+def render_perf_panel():
+    """This session's span timings, up to the last finished script run."""
+    snapshot = ss.metrics.snapshot()
+    spans, fields = snapshot["spans"], snapshot["fields"]
+    if not spans:
+        st.caption("No timings yet.")
+        return
+    rows = ["| Span | Count | Mean | Last | Slowest |", "|---|--:|--:|--:|--:|"]
+    for name, (count, total, slowest, last) in sorted(spans.items(), key=lambda item: -item[1][1]):
+        rows.append(
+            f"| {name} | {count} | {total / count * 1e3:,.0f} ms | {last * 1e3:,.0f} ms | {slowest * 1e3:,.0f} ms |"
+        )
+    st.markdown("\n".join(rows))
+    calls = spans.get("llm_call", (0,))[0]
+    if calls:
+        def call_total(field):
+            return fields.get(("llm_call", field), (0, 0))
+
+        streamed, ttft = call_total("ttft")
+        parts = [f"{calls} model calls", f"{call_total('cache_hit')[1] / calls:.0%} from cache"]
+        if streamed:
+            parts.append(f"first token {ttft / streamed * 1e3:,.0f} ms avg")
+        parts.append(f"{call_total('retries')[1]:.0f} retries · {call_total('errors')[1]:.0f} errors")
+        st.caption(" · ".join(parts))
 
 # ---------- SIDEBAR: SETTINGS + POMODORO ----------
 with st.sidebar:
@@ -594,6 +338,7 @@ with st.sidebar:
     st.markdown("### ⚙️ Response Settings", unsafe_allow_html=True)
     max_tokens = st.slider("Response length", 128, 1024, 300, 8)
     temperature = st.slider("Creativity", 0.0, 1.0, 0.5, 0.05)
+    stream_output = st.toggle("Stream responses", value=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Target level
@@ -638,8 +383,25 @@ with st.sidebar:
             unsafe_allow_html=True,
         )
     st.markdown("</div>", unsafe_allow_html=True)
+    cache_stats = get_response_cache().stats()
+    st.caption(
+        f"Response cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%})"
+    )
+    usage = ss.token_usage.snapshot()
+    if usage["calls"]:
+        st.caption(
+            f"Tokens this session: ~{usage['prompt_tokens']:,} prompt · "
+            f"~{usage['completion_tokens']:,} completion ({usage['calls']} calls)"
+        )
+    if get_backend().name != "openai":
+        st.caption(f"Model backend: {get_backend().name}")
     st.markdown("</div>", unsafe_allow_html=True)
 
+    if PERF_PANEL:
+        with st.expander("⏱️ Performance (this session)"):
+            render_perf_panel()
+
     # Pomodoro timer
     st.markdown("<div class='side-card'>", unsafe_allow_html=True)
     st.markdown("#### ⏱️ Pomodoro Focus Timer", unsafe_allow_html=True)
@@ -662,32 +424,12 @@ with st.sidebar:
             ss.pomo_end = None
             ss.pomo_mode = "Focus"
 
-    # Display timer
+    # Display timer (ticks in the browser; the script only reruns on interaction)
     if ss.pomo_running and ss.pomo_end:
-        remaining = ss.pomo_end - datetime.now()
-        if remaining.total_seconds() <= 0:
-            # Switch or stop
-            if ss.pomo_mode == "Focus":
-                ss.pomo_mode = "Break"
-                ss.pomo_end = datetime.now() + timedelta(minutes=ss.pomo_break_len)
-                st.success("Focus session complete. Break started! 🌿")
-            else:
-                ss.pomo_running = False
-                ss.pomo_end = None
-                ss.pomo_mode = "Focus"
-                st.success("Break finished. Back to focus when you're ready ✨")
+        for message in advance_pomodoro(datetime.now()):
+            st.success(message)
         if ss.pomo_running and ss.pomo_end:
-            remaining = ss.pomo_end - datetime.now()
-            total = int(remaining.total_seconds())
-            mins, secs = divmod(max(total, 0), 60)
-            st.markdown(
-                f"<div style='font-size:1.6rem; font-weight:700; text-align:center; margin-top:.4rem;'>"
-                f"{ss.pomo_mode}: {mins:02d}:{secs:02d}</div>",
-                unsafe_allow_html=True,
-            )
-            # auto refresh
-            time.sleep(1)
-            st.experimental_rerun()
+            render_pomodoro_clock(datetime.now())
     else:
         st.caption("Set durations, press Start, and keep this tab open while you study.")
     st.markdown("</div>", unsafe_allow_html=True)
@@ -701,203 +443,437 @@ with st.sidebar:
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ---------- HELPERS ----------
-def clean_text(text: str) -> str:
-    text = text.replace("✅", "[OK]").replace("❌", "[ERROR]").replace("🤔", "")
-    return text.encode("ascii", "ignore").decode("ascii")
-
-def generate_pdf(input_text, output_text, action_type):
-    pdf = FPDF()
-    pdf.add_page()
-
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Smart Study Assistant", ln=True, align="C")
-    pdf.ln(3)
-
-    pdf.set_font("Arial", "I", 11)
-    pdf.cell(0, 8, f"Type: {action_type}", ln=True, align="C")
-    pdf.ln(2)
-    pdf.set_font("Arial", "", 9)
-    pdf.cell(0, 6, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="C")
-    pdf.ln(6)
-
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 7, "Input:", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.multi_cell(0, 5, clean_text(input_text))
-    pdf.ln(3)
-
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 7, "Output:", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.multi_cell(0, 5, clean_text(output_text))
-
-    return pdf.output(dest="S").encode("latin-1")
-
-def get_download_link(pdf_data, filename):
-    b64 = base64.b64encode(pdf_data).decode()
-    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}" class="download-btn">📥 Download PDF</a>'
-
-def call_chat(prompt: str) -> str:
-    if not openai.api_key:
-        return "❌ Error: OPENAI_API_KEY is missing. Set it in your .env file (not in GitHub)."
-    try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert study assistant. Be clear, structured, and learner-friendly."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=max_tokens,
-            temperature=temperature,
+PDF_EXPORTS_KEPT = 5  # per session; older exports are rebuilt on request
+# Longest a rerun waits on background work once the page is drawn; anything
+# still running then is picked up by another rerun, so clicks never queue behind it.
+DEFERRED_WAIT = 0.5
+
+def finished(future, timeout: float = 0) -> bool:
+    wait([future], timeout=timeout)
+    return future.done()
+
+def pdf_export_key() -> str:
+    return f"{ss.last_entry_id}-pack" if ss.last_pack else str(ss.last_entry_id)
+
+def request_pdf_export(key: str):
+    """Build the PDF for the current output on a worker thread."""
+    ss.pdf_exports[key] = metrics.submit(
+        get_executor(), result_pdf, ss.last_input or "", ss.last_output, ss.last_action
+    )
+    while len(ss.pdf_exports) > PDF_EXPORTS_KEPT:
+        del ss.pdf_exports[next(iter(ss.pdf_exports))]
+
+def build_history_export(export_format: str, entries) -> bytes:
+    writer = EXPORT_FORMATS[export_format][0]
+    out = io.BytesIO()
+    with metrics.span("export", format=export_format) as span:
+        writer(entries, out)
+        span.set(bytes=out.tell())
+    return out.getvalue()
+
+def request_history_export(key: tuple):
+    """Export the whole history in one pass on a worker thread."""
+    ss.history_exports = {
+        key: metrics.submit(get_executor(), build_history_export, key[0], iter(ss.history))
+    }
+
+def show_history_download(placeholder, key: tuple, timeout: float = 0) -> bool:
+    """Show the download once the export is built; ``False`` while it is still running."""
+    export = ss.history_exports[key]
+    if not isinstance(export, bytes):
+        if not finished(export, timeout):
+            placeholder.caption("⏳ Exporting your history...")
+            return False
+        export = ss.history_exports[key] = export.result()
+    _, extension, mime = EXPORT_FORMATS[key[0]]
+    placeholder.download_button(
+        f"📥 Download {extension.upper()}",
+        data=export,
+        file_name=f"study_history_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}",
+        mime=mime,
+        key="history_download",
+    )
+    return True
+
+def show_pdf_download(placeholder, key: str, timeout: float = 0) -> bool:
+    """Show the download once the PDF is built; ``False`` while it is still running."""
+    export = ss.pdf_exports[key]
+    if not isinstance(export, bytes):
+        if not finished(export, timeout):
+            placeholder.caption("⏳ Preparing your PDF...")
+            return False
+        export = ss.pdf_exports[key] = export.result()
+    placeholder.download_button(
+        "📥 Download PDF",
+        data=export,
+        file_name=f"{ss.last_action.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
+        mime="application/pdf",
+        key=f"pdf_download_{key}",
+    )
+    return True
+
+def current_settings() -> ChatSettings:
+    return ChatSettings(max_tokens, temperature, get_response_cache(), get_backend(), ss.token_usage)
+
+def warn_budget(notes: list):
+    if notes:
+        st.warning(
+            "✂️ Input shortened to fit the model's context window: "
+            + "; ".join(dict.fromkeys(notes)) + "."
         )
-        return resp["choices"][0]["message"]["content"].strip()
-    except Exception as e:
-        return f"❌ Error: {e}"
 
-def extract_text_from_file(uploaded_file) -> str:
+def find_history_entry(entry_id):
+    return ss.history.find(entry_id)
+
+def start_roadmap(entry: HistoryRecord):
+    """Generate the study path for a history entry in the background."""
+    if entry.type not in ["Summarize", "Explain"] or not get_backend().ready:
+        return
+    # Large inputs would overflow the prompt; plan from the summary instead.
+    source = entry.input
+    if estimate_tokens(source) > SUMMARY_CHUNK_TOKENS:
+        source = entry.content
+    source, settings, _ = fit_input(build_roadmap_prompt(""), source, current_settings())
+    ss.roadmap_jobs[entry.id] = metrics.submit(
+        get_executor(),
+        complete,
+        build_roadmap_prompt(source),
+        settings,
+    )
+
+def collect_roadmap(entry: HistoryRecord, timeout: float = 0):
+    """Move a finished background roadmap (waiting up to ``timeout`` s) onto its history entry."""
+    job = ss.roadmap_jobs.get(entry.id)
+    if job is not None and finished(job, timeout):
+        entry.roadmap = job.result()
+        ss.history.save(entry)
+        del ss.roadmap_jobs[entry.id]
+    return entry.roadmap
+
+def extract_text_from_file(uploaded_file, page_spec: str = "") -> str:
+    data = uploaded_file.getvalue()
+    cache = get_extraction_cache()
+    key = f"{hashlib.sha256(data).hexdigest()}:{uploaded_file.name.lower()[-5:]}:{page_spec.strip()}"
+    text = cache.get(key)
+    if text is not None:
+        return text
     try:
-        name = uploaded_file.name.lower()
-        if name.endswith(".txt"):
-            return uploaded_file.read().decode("utf-8", errors="ignore")
-        if name.endswith(".pdf"):
-            from PyPDF2 import PdfReader
-            reader = PdfReader(uploaded_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            return text
-        if name.endswith(".docx"):
-            import docx2txt
-            tmp_path = os.path.join("/tmp", f"upload_{datetime.now().timestamp()}.docx")
-            with open(tmp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            return docx2txt.process(tmp_path) or ""
+        text = extract_text(data, uploaded_file.name, page_spec=page_spec, max_chars=EXTRACT_MAX_CHARS)
     except Exception as e:
         st.error(f"Could not read file: {e}")
-    return ""
-
-def build_prompt(action: str, text: str, difficulty: str, style: str) -> str:
-    level_hint = ""
-    if difficulty == "Beginner":
-        level_hint = "Explain as if to a complete beginner. "
-    elif difficulty == "High School":
-        level_hint = "Aim at an advanced high-school student. "
-    elif difficulty == "University":
-        level_hint = "Aim at a typical university student. "
-    elif difficulty == "Advanced":
-        level_hint = "Aim at an advanced learner; keep it rigorous. "
-
-    style_hint = ""
-    if style == "Short & Direct":
-        style_hint = "Keep it concise and direct. "
-    elif style == "Step-by-Step":
-        style_hint = "Use a clear step-by-step structure with numbered steps. "
-    elif style == "With Examples":
-        style_hint = "Include simple, concrete examples. "
-    elif style == "With Analogies":
-        style_hint = "Use analogies and intuitive explanations. "
-
-    base_prompts = {
-        "Summarize": (
-            "Summarize the following in 5-8 bullet points. Highlight key concepts, formulas, and definitions. "
-        ),
-        "Explain": (
-            "Explain the following clearly using headings and short paragraphs. "
-        ),
-        "Quiz": (
-            "Create 3 multiple-choice questions (A–D) from this content. "
-            "After each question, include the correct answer on a new line starting with 'Answer:'. "
-        ),
-        "Flashcard": (
-            "Create 5 flashcards strictly in this format:\nFRONT: ...\nBACK: ...\n"
-        ),
-    }
-
-    prefix = base_prompts.get(action, "")
-    meta = level_hint + style_hint
-    return prefix + meta + "\n\n" + text
+        return ""
+    if text:
+        cache.set(key, text)
+    return text
+
+def focus_topic(action: str, text: str, topic_label: str):
+    return focus_text(
+        action, text, topic_label, get_retrieval_cache(),
+        RETRIEVAL_MIN_TOKENS, RETRIEVAL_PASSAGE_TOKENS, RETRIEVAL_TOP_K,
+    )
 
-def handle_action(action: str, text: str, topic_label: str):
+def handle_action(action: str, text: str, topic_label: str, live=None):
+    """Run an action; with ``live`` (an st.empty) and streaming on, render output as it arrives."""
     if not text.strip():
         st.warning("⚠️ Please enter some text or upload a file first.")
         return
 
-    prompt = build_prompt(action, text, difficulty_level, style_preset)
-
+    # A meter per action, so its token counts can go on its history entry.
+    settings = current_settings()._replace(meter=TokenMeter())
+    with metrics.span("prompt", action=action):
+        source, used, total = focus_topic(action, text, topic_label)
+        prefix = build_prompt(action, "", difficulty_level, style_preset)
+        room, settings, notes = input_room(prefix, settings)
+        # Only a Summarize that cannot fit in one prompt is summarized section by section.
+        large_summary = action == "Summarize" and estimate_tokens(source) > room
+        if not large_summary:
+            source, trimmed = fit_to_budget(source, room)
+            notes += trimmed
+            prompt = prefix + source
+    if used:
+        st.caption(f"🔎 Using the {used} of {total} passages that best match “{topic_label.strip()}”.")
+    if not large_summary:
+        warn_budget(notes)
+
+    started = time.perf_counter()
+    first_token = None
+    error = None
+    if large_summary:
+        merged, error = summarize_large(source, settings, room)
+        if not error:
+            # The merged section summaries are budgeted like any other input.
+            merged, trimmed = fit_to_budget(merged, room)
+            warn_budget(notes + trimmed)
+            prompt = prefix + merged
     with st.spinner(f"Generating your {action.lower()}..."):
-        result = call_chat(prompt)
+        if error:
+            result = error
+        elif stream_output and live is not None:
+            def timed(deltas):
+                nonlocal first_token
+                for delta in deltas:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    yield delta
+
+            with live.container():
+                result = render_stream(action, timed(stream_complete(prompt, settings))).strip()
+            live.empty()
+        else:
+            result = complete(prompt, settings)
+        result, items = structure_result(action, result, settings)
+    finished = time.perf_counter()
+    ss.token_usage.add(settings.meter)
 
     ss.last_input = text
     ss.last_output = result
     ss.last_action = action
+    ss.last_pack = None
+
+    timing = {"ttft": (first_token or finished) - started, "total": finished - started, **token_counts(settings.meter)}
+    entry = make_history_entry(action, text, result, topic_label, timing, items)
+    record_results([entry])
+    ss.last_entry_id = entry.id
+    if not result.startswith("❌"):
+        start_roadmap(entry)
+
+STAT_KEYS = {
+    "Summarize": "summaries",
+    "Explain": "explanations",
+    "Quiz": "quizzes",
+    "Flashcard": "flashcards",
+}
 
-    # stats
-    if action == "Summarize":
-        ss.stats["summaries"] += 1
-    elif action == "Explain":
-        ss.stats["explanations"] += 1
-    elif action == "Quiz":
-        ss.stats["quizzes"] += 1
-    elif action == "Flashcard":
-        ss.stats["flashcards"] += 1
-    ss.stats["total"] += 1
-
-    # history
+def make_history_entry(
+    action: str, text: str, result: str, topic_label: str, timing: dict, items: list = None
+) -> HistoryRecord:
     tag = topic_label.strip() if topic_label.strip() else (
         text[:40] + ("..." if len(text) > 40 else "")
     )
-    ss.history.append(
-        {
-            "topic": text[:110],
-            "type": action,
-            "content": result,
-            "timestamp": datetime.now().strftime("%H:%M"),
-            "tag": tag,
-        }
+    return HistoryRecord(
+        id=uuid.uuid4().hex[:12],
+        topic=text[:110],
+        type=action,
+        input=text,
+        content=result,
+        timestamp=datetime.now().strftime("%H:%M"),
+        tag=tag,
+        timing=timing,
+        items=items,
     )
 
-def render_quiz(output_text: str):
-    blocks = [b.strip() for b in output_text.split("\n\n") if b.strip()]
-    if not blocks:
-        st.write(output_text)
+def record_results(entries: list):
+    """Apply stats and history for a batch of results in one step."""
+    stats = dict(ss.stats)
+    deltas = {}
+    for entry in entries:
+        for key in (STAT_KEYS[entry.type], "total"):
+            stats[key] += 1
+            deltas[f"{ss.user_ns}stats:{key}"] = deltas.get(f"{ss.user_ns}stats:{key}", 0) + 1
+    ss.history.extend(entries)
+    ss.stats = stats
+    repeats = 0
+    for entry in entries:
+        if entry.type == "Flashcard" and entry.items:
+            repeats += len(entry.items) - ss.deck.add_many(entry.items, source=entry.id)
+        elif entry.type == "Quiz" and entry.items:
+            repeats += sum(
+                ss.quiz_index.check_and_add(f"{entry.id}:{n}", question.question) is not None
+                for n, question in enumerate(entry.items)
+            )
+    if repeats:
+        st.toast(f"🔁 {repeats} of these cards or questions repeat ones you already have.")
+    if get_storage() is not None:
+        get_storage().write(incrs=deltas)
+
+def summarize_large(text: str, settings: ChatSettings, room: int):
+    """Map step of a large summary, with per-chunk progress; returns (merged partials, error)."""
+    progress = st.progress(0.0, text="Summarizing sections...")
+
+    def on_progress(done, total, index, ok):
+        progress.progress(
+            done / total,
+            text=f"Summarized section {done} of {total}" + ("" if ok else f" (part {index + 1} failed)"),
+        )
+
+    try:
+        return summarize_sections(
+            text,
+            settings,
+            SUMMARY_CHUNK_TOKENS,
+            SUMMARY_CONCURRENCY,
+            on_progress,
+            merged_tokens=room,
+        )
+    finally:
+        progress.empty()
+
+PACK_ACTIONS = ["Summarize", "Explain", "Quiz", "Flashcard"]
+PACK_LABELS = {"Summarize": "📋 Summary", "Explain": "💡 Explanation", "Quiz": "❓ Quiz", "Flashcard": "🃏 Flashcards"}
+
+def handle_study_pack(text: str, topic_label: str):
+    """Run all four actions concurrently and show each in its tab as it finishes."""
+    if not text.strip():
+        st.warning("⚠️ Please enter some text or upload a file first.")
         return
-    for i, block in enumerate(blocks, start=1):
-        if "Answer:" in block:
-            q_part, ans = block.rsplit("Answer:", 1)
-            st.markdown(f"**Q{i}.** {q_part.strip()}")
-            with st.expander("Show answer", expanded=False):
-                st.markdown(f"**Answer:** {ans.strip()}")
+
+    settings = current_settings()
+    jobs, notes = {}, []
+    with metrics.span("prompt", action="Study Pack"):
+        for action in PACK_ACTIONS:
+            prefix = build_prompt(action, "", difficulty_level, style_preset)
+            source = focus_topic(action, text, topic_label)[0]
+            # run_action fits the input to the model window.
+            jobs[action] = (source, prefix, settings._replace(meter=TokenMeter()))
+    tabs = dict(zip(PACK_ACTIONS, st.tabs([PACK_LABELS[a] for a in PACK_ACTIONS])))
+    slots = {}
+    for action, tab in tabs.items():
+        with tab:
+            slots[action] = st.empty()
+            slots[action].caption(f"⏳ Generating your {action.lower()}...")
+
+    started = time.perf_counter()
+    results, items, timings = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=len(PACK_ACTIONS)) as pool:
+        futures = {
+            metrics.submit(pool, run_action, action, *job, SUMMARY_CHUNK_TOKENS, SUMMARY_CONCURRENCY): action
+            for action, job in jobs.items()
+        }
+        for future in as_completed(futures):
+            action = futures[future]
+            try:
+                results[action], items[action], job_notes = future.result()
+                notes.extend(job_notes)
+            except Exception as e:
+                results[action], items[action] = f"❌ Error: {e}", None
+            meter = jobs[action][2].meter
+            ss.token_usage.add(meter)
+            # Pack calls are not streamed, so there is no first-token time to record.
+            timings[action] = {"total": time.perf_counter() - started, **token_counts(meter)}
+            with slots[action].container():
+                render_output(action, results[action], items[action])
+    total = time.perf_counter() - started
+    warn_budget(notes)
+
+    entries = [
+        make_history_entry(action, text, results[action], topic_label, timings[action], items[action])
+        for action in PACK_ACTIONS
+    ]
+    record_results(entries)
+    ss.last_input = text
+    ss.last_action = "Study Pack"
+    ss.last_output = "\n\n".join(f"## {a}\n\n{results[a]}" for a in PACK_ACTIONS)
+    ss.last_pack = {"entries": {e.type: e.id for e in entries}, "total": total, "notes": notes}
+    ss.last_entry_id = entries[0].id
+    if not entries[0].content.startswith("❌"):
+        start_roadmap(entries[0])
+
+def render_output(action: str, output_text: str, items: list = None):
+    """Show an action's result; Quiz and Flashcard render from their parsed records."""
+    if action in RECORD_TYPES:
+        # Entries saved before structured output only have text; parse it here.
+        items = items or records_from_text(action, output_text)
+        if items:
+            render = render_question if action == "Quiz" else render_flashcard
+            for n, record in enumerate(items, start=1):
+                render(n, record)
+            return
+    st.write(output_text)
+
+def render_question(n: int, question: QuizQuestion):
+    st.markdown(f"**Q{n}.** {question.question}")
+    if question.options:
+        st.markdown("  \n".join(f"{LETTERS[i]}) {option}" for i, option in enumerate(question.options)))
+    with st.expander("Show answer", expanded=False):
+        answer = question.answer
+        if question.options and answer in LETTERS[:len(question.options)]:
+            answer = f"{answer}) {question.options[LETTERS.index(answer)]}"
+        st.markdown(f"**Answer:** {answer}")
+        if question.explanation:
+            st.caption(question.explanation)
+
+def render_flashcard(idx: int, card: tuple):
+    f_txt, b_txt = card
+    st.markdown(f"**Card {idx}:** {f_txt}")
+    with st.expander("Show answer", expanded=False):
+        st.markdown(b_txt)
+
+def stream_records(action: str, deltas) -> str:
+    """Render each question or card as soon as its JSON object is complete."""
+    reader, shown = JSONItemReader(), 0
+    render = render_question if action == "Quiz" else render_flashcard
+    for delta in deltas:
+        for item in reader.feed(delta):
+            try:
+                record = VALIDATORS[action](item)
+            except ValueError:
+                continue  # left for validation (and repair) once the reply is complete
+            shown += 1
+            render(shown, record)
+    if not shown:
+        st.write(reader.text)
+    return reader.text
+
+def render_stream(action: str, deltas) -> str:
+    """Render streamed output for an action and return the full text."""
+    if action in RECORD_TYPES:
+        return stream_records(action, deltas)
+    placeholder = st.empty()
+    text = ""
+    for delta in deltas:
+        text += delta
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+HISTORY_PAGE_SIZE = 10
+REVIEW_BATCH = 20
+
+def render_review(now: float):
+    """Review due flashcards one at a time, fetching them from the deck index in small batches."""
+    if not ss.reviewing:
+        st.caption(f"{len(ss.deck)} cards in your deck. New Flashcards results are added automatically.")
+        if st.button("▶ Start review", key="review_start"):
+            ss.reviewing = True
         else:
-            st.markdown(block)
-
-def render_flashcards(output_text: str):
-    lines = [l for l in output_text.splitlines() if l.strip()]
-    cards = []
-    front, back = None, None
-    for line in lines:
-        if line.startswith("FRONT:"):
-            if front or back:
-                cards.append((front, back))
-            front = line.replace("FRONT:", "").strip()
-            back = None
-        elif line.startswith("BACK:"):
-            back = line.replace("BACK:", "").strip()
-    if front or back:
-        cards.append((front, back))
-
-    if not cards:
-        st.write(output_text)
+            return
+    if not ss.review_queue:
+        ss.review_queue = [card.id for card in ss.deck.due(now, REVIEW_BATCH)]
+    card = ss.deck.get(ss.review_queue[0]) if ss.review_queue else None
+    if card is None:
+        upcoming = ss.deck.next_due()
+        st.caption(
+            "🎉 Nothing due right now."
+            + (f" Next card due {datetime.fromtimestamp(upcoming).strftime('%d %b %H:%M')}." if upcoming else "")
+        )
+        ss.reviewing = False
         return
-
-    for idx, (f_txt, b_txt) in enumerate(cards, start=1):
-        st.markdown(f"**Card {idx}:** {f_txt}")
-        with st.expander("Show answer", expanded=False):
-            st.markdown(b_txt)
+    st.markdown(f"**{card.front}**")
+    if not ss.review_revealed:
+        ss.review_revealed = st.button("Show answer", key="review_reveal")
+    if ss.review_revealed:
+        st.markdown(card.back)
+        for col, (label, quality) in zip(st.columns(len(GRADES)), GRADES.items()):
+            if col.button(label, key=f"review_{label.lower()}"):
+                ss.deck.review(card, quality, now)
+                ss.review_queue.pop(0)
+                ss.review_revealed = False
+                st.rerun()
+
+def render_history_item(item: HistoryRecord):
+    st.markdown(
+        f"""
+    <div class='history-item'>
+        <div class='history-type'>{item.type} • <span class='history-time'>{item.timestamp}</span></div>
+        <div class='history-tag'>Tag: {item.tag or 'General'}</div>
+        <div style='font-size:.66rem; margin-top:.14rem;'>{item.topic}</div>
+    </div>
+    """,
+        unsafe_allow_html=True,
+    )
 
 # ---------- MAIN UI ----------
+deferred = []  # fill(timeout) -> done, for background work; run once the page is drawn
 st.markdown("<div class='app-shell'>", unsafe_allow_html=True)
 
 # Topbar
@@ -941,13 +917,29 @@ with left:
         label_visibility="visible",
     )
     if uploaded_file is not None:
-        extracted = extract_text_from_file(uploaded_file)
-        if extracted:
-            ss.uploaded_text = extracted
+        page_spec = ""
+        if uploaded_file.name.lower().endswith(".pdf"):
+            page_spec = st.text_input(
+                "📄 Pages (optional)",
+                placeholder="e.g. 1-20, 35, 40-",
+                key="page_spec",
+            )
+        # Only extract when a new file (or page range) arrives, not on every rerun.
+        upload_key = (uploaded_file.file_id, page_spec)
+        if ss.upload_key != upload_key:
+            ss.upload_key = upload_key
+            # Replace the previous upload even when this one fails, so its
+            # text is not presented as this file's.
+            ss.uploaded_text = extract_text_from_file(uploaded_file, page_spec)
+            ss.uploaded_tokens = estimate_tokens(ss.uploaded_text)
+        if ss.uploaded_text:
             st.success(
                 f"Loaded content from `{uploaded_file.name}` "
-                f"({len(extracted)} characters). You can edit it below."
+                f"({len(ss.uploaded_text):,} characters, ~{ss.uploaded_tokens:,} tokens). "
+                f"You can edit it below."
             )
+            if len(ss.uploaded_text) >= EXTRACT_MAX_CHARS:
+                st.info("This document is very long, so only its beginning was loaded. Pick a page range to load another part.")
 
     topic_label = st.text_input(
         "🏷️ Topic label (optional)",
@@ -969,25 +961,31 @@ with left:
         value=default_text,
     )
 
-    c1, c2, c3, c4, c5 = st.columns([1, 1, 1, 1, 0.9])
+    requested_action = None
+    c1, c2, c3, c4, c6, c5 = st.columns([1, 1, 1, 1, 1.1, 0.9])
     with c1:
         if st.button("📋 Summarize", use_container_width=True):
-            handle_action("Summarize", user_text, topic_label)
+            requested_action = "Summarize"
     with c2:
         if st.button("💡 Explain", use_container_width=True):
-            handle_action("Explain", user_text, topic_label)
+            requested_action = "Explain"
     with c3:
         if st.button("❓ Quiz Me", use_container_width=True):
-            handle_action("Quiz", user_text, topic_label)
+            requested_action = "Quiz"
     with c4:
         if st.button("🃏 Flashcards", use_container_width=True):
-            handle_action("Flashcard", user_text, topic_label)
+            requested_action = "Flashcard"
+    with c6:
+        if st.button("📦 Study Pack", use_container_width=True):
+            requested_action = "Study Pack"
     with c5:
         if st.button("🧹 Clear", use_container_width=True):
             ss.last_output = ""
             ss.last_action = ""
             ss.last_input = ""
             ss.uploaded_text = ""
+            ss.upload_key = None
+            ss.last_pack = None
             st.experimental_rerun()
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -996,42 +994,72 @@ with left:
     st.markdown("### 📤 Output")
     st.markdown("<div class='result-card'>", unsafe_allow_html=True)
 
+    if requested_action == "Study Pack":
+        live = st.empty()
+        with live.container():
+            handle_study_pack(user_text, topic_label)
+        live.empty()
+    elif requested_action:
+        handle_action(requested_action, user_text, topic_label, live=st.empty())
+
     if ss.last_output:
         st.markdown(
             f"<div class='badge'>✅ {ss.last_action}</div>",
             unsafe_allow_html=True,
         )
-
-        if ss.last_action == "Quiz":
-            render_quiz(ss.last_output)
-        elif ss.last_action == "Flashcard":
-            render_flashcards(ss.last_output)
+        entry = find_history_entry(ss.last_entry_id)
+        if ss.last_pack:
+            st.caption(f"⚡ All four ready in {ss.last_pack['total']:.2f}s")
+            warn_budget(ss.last_pack.get("notes", []))
+            pack_tabs = st.tabs([PACK_LABELS[a] for a in PACK_ACTIONS])
+            for action, tab in zip(PACK_ACTIONS, pack_tabs):
+                pack_entry = find_history_entry(ss.last_pack["entries"][action])
+                with tab:
+                    if pack_entry is not None:
+                        render_output(action, pack_entry.content, pack_entry.items)
         else:
-            st.write(ss.last_output)
-
-        pdf_bytes = generate_pdf(
-            ss.last_input or "",
-            ss.last_output,
-            ss.last_action,
-        )
-        link = get_download_link(
-            pdf_bytes,
-            f"{ss.last_action.lower()}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-        )
-        st.markdown(link, unsafe_allow_html=True)
-
-        # Study path
-        if ss.last_action in ["Summarize", "Explain"] and openai.api_key:
+            if entry is not None and entry.timing:
+                st.caption(
+                    "⚡ "
+                    + (f"First token {entry.timing['ttft']:.2f}s · " if "ttft" in entry.timing else "")
+                    + f"total {entry.timing['total']:.2f}s"
+                    + (
+                        f" · ~{entry.timing['prompt_tokens']:,} prompt + "
+                        f"{entry.timing['completion_tokens']:,} completion tokens"
+                        if entry.timing.get("prompt_tokens") else ""
+                    )
+                )
+            render_output(ss.last_action, ss.last_output, entry.items if entry is not None else None)
+
+        # PDF export is only built when asked for, off the script thread.
+        pdf_key = pdf_export_key()
+        pdf_slot = st.empty()
+        if pdf_key in ss.pdf_exports:
+            deferred.append(lambda timeout: show_pdf_download(pdf_slot, pdf_key, timeout))
+        elif pdf_slot.button("📄 Prepare PDF", key="pdf_prepare"):
+            request_pdf_export(pdf_key)
+            pdf_slot.caption("⏳ Preparing your PDF...")
+            deferred.append(lambda timeout: show_pdf_download(pdf_slot, pdf_key, timeout))
+
+        # Study path (generated once per history entry, in the background)
+        if entry is not None and (entry.roadmap or entry.id in ss.roadmap_jobs):
             with st.expander(
                 "🎯 Suggested study path (what to learn next)", expanded=True
             ):
-                roadmap_prompt = (
-                    "Based on this topic/content, suggest a focused 5-step study roadmap "
-                    "to fully understand and master it. Be concrete but concise:\n\n"
-                    + (ss.last_input or "")
-                )
-                roadmap = call_chat(roadmap_prompt)
-                st.markdown(roadmap)
+                roadmap = collect_roadmap(entry)
+                if roadmap:
+                    st.markdown(roadmap)
+                else:
+                    roadmap_slot = st.empty()
+                    roadmap_slot.caption("⏳ Building your study path...")
+
+                    def fill_roadmap(timeout):
+                        roadmap = collect_roadmap(entry, timeout)
+                        if roadmap:
+                            roadmap_slot.markdown(roadmap)
+                        return entry.id not in ss.roadmap_jobs
+
+                    deferred.append(fill_roadmap)
     else:
         st.info("Paste content or upload a file above, then choose an action to see results here.")
 
@@ -1050,21 +1078,37 @@ with right:
     st.markdown("<div class='side-card'>", unsafe_allow_html=True)
     st.markdown("#### 🗂️ Recent activity", unsafe_allow_html=True)
     if ss.history:
-        for item in reversed(ss.history[-7:]):
-            st.markdown(
-                f"""
-            <div class='history-item'>
-                <div class='history-type'>{item['type']} • <span class='history-time'>{item['timestamp']}</span></div>
-                <div class='history-tag'>Tag: {item.get('tag','General')}</div>
-                <div style='font-size:.66rem; margin-top:.14rem;'>{item['topic']}</div>
-            </div>
-            """,
-                unsafe_allow_html=True,
+        for item in ss.history.recent(7):
+            render_history_item(item)
+        with st.expander("🔎 Browse all history", expanded=False):
+            pages = ss.history.page_count(HISTORY_PAGE_SIZE)
+            page_no = st.number_input("Page", min_value=1, max_value=pages, value=1, key="history_page")
+            for item in ss.history.page(int(page_no) - 1, HISTORY_PAGE_SIZE):
+                render_history_item(item)
+            st.caption(
+                f"{len(ss.history)} entries · {pages} pages · "
+                f"{ss.history.memory_bytes() / 1024:.0f} KB in memory"
             )
+        export_format = st.selectbox(
+            "Export all history as", list(EXPORT_FORMATS), key="export_format"
+        )
+        export_key = (export_format, len(ss.history))
+        export_slot = st.empty()
+        if export_key in ss.history_exports:
+            deferred.append(lambda timeout: show_history_download(export_slot, export_key, timeout))
+        elif export_slot.button("📦 Export history", key="history_export"):
+            request_history_export(export_key)
+            export_slot.caption("⏳ Exporting your history...")
+            deferred.append(lambda timeout: show_history_download(export_slot, export_key, timeout))
     else:
         st.caption("No sessions yet. Your work will appear here.")
     st.markdown("</div>", unsafe_allow_html=True)
 
+    st.markdown("<div class='side-card'>", unsafe_allow_html=True)
+    st.markdown("#### 🧠 Review flashcards", unsafe_allow_html=True)
+    render_review(time.time())
+    st.markdown("</div>", unsafe_allow_html=True)
+
 st.markdown(
     """
 <div class='footer'>
@@ -1074,3 +1118,13 @@ st.markdown(
 """,
     unsafe_allow_html=True,
 )
+
+# Fill in work that was still running in the background, now that the page is
+# drawn, waiting at most DEFERRED_WAIT in all; poll again for what is left.
+deadline = time.monotonic() + DEFERRED_WAIT
+pending = [fill for fill in deferred if not fill(max(0.0, deadline - time.monotonic()))]
+
+# Runs cut short by a rerun or stop are not counted.
+metrics.finish("rerun", time.perf_counter() - run_started, {})
+if pending:
+    st.rerun()
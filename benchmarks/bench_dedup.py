@@ -0,0 +1,89 @@
+"""Benchmark near-duplicate detection on a large flashcard deck.
+
+    python benchmarks/bench_dedup.py [--cards 30000] [--variants 0.1]
+
+Inserts generated cards into a MinHash/LSH index in a temporary SQLite file;
+a fraction of them are light rewordings of earlier cards. Reports insert
+time per card, how many planted variants were caught and how many distinct
+cards were wrongly flagged, and compares the per-query cost with checking
+the new card against every stored signature.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_core.dedup import NearDuplicateIndex  # noqa: E402
+from study_core.storage import SQLiteKV  # noqa: E402
+
+SYLLABLES = "ba ce di fo gu ha je ki lo mu na pe ri so tu va we xi yo zu tra ple sen mor qua".split()
+# A few thousand made-up words: real decks span many topics, so cards share few words.
+WORDS = sorted({"".join(random.Random(n).choices(SYLLABLES, k=3)) for n in range(4000)})
+
+
+def make_card(rng: random.Random) -> str:
+    return f"What is {' '.join(rng.choices(WORDS, k=3))}? {' '.join(rng.choices(WORDS, k=10)).capitalize()}."
+
+
+def reword(card: str, rng: random.Random) -> str:
+    # Change case and punctuation and swap one word, like a regenerated card.
+    words = card.rstrip(".").split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words).upper() + "!"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=30000)
+    parser.add_argument("--variants", type=float, default=0.1, help="share of inserts that reword an earlier card")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(SQLiteKV(os.path.join(tmp, "dedup.db")), "user:bench:")
+        originals, signatures = [], []
+        caught = planted = false_flags = 0
+        started = time.perf_counter()
+        for n in range(args.cards):
+            is_variant = originals and rng.random() < args.variants
+            text = reword(rng.choice(originals), rng) if is_variant else make_card(rng)
+            match = index.check_and_add(str(n), text)
+            if is_variant:
+                planted += 1
+                caught += match is not None
+            else:
+                originals.append(text)
+                false_flags += match is not None
+            if match is None:
+                signatures.append(index.signature(text))
+        elapsed = time.perf_counter() - started
+        print(f"{args.cards:,} inserts, {len(signatures):,} cards indexed")
+        print(f"insert (check + add)        {elapsed / args.cards * 1e3:8.3f} ms/card")
+        print(f"variants caught             {caught:,} of {planted:,} ({caught / max(planted, 1):.0%})")
+        print(f"distinct cards flagged      {false_flags:,} of {len(originals):,}")
+
+        probe = make_card(rng)
+        runs = 200
+        started = time.perf_counter()
+        for _ in range(runs):
+            index.find(probe)
+        lsh = (time.perf_counter() - started) / runs
+        matrix = np.stack(signatures)
+        started = time.perf_counter()
+        for _ in range(runs):
+            signature = index.signature(probe)
+            (matrix == signature).mean(axis=1).max()
+        scan = (time.perf_counter() - started) / runs
+        print(f"\nquery, LSH bands            {lsh * 1e3:8.3f} ms")
+        print(f"query, every signature      {scan * 1e3:8.3f} ms (NumPy, signatures in memory)")
+        index.kv.close()
+
+
+if __name__ == "__main__":
+    main()
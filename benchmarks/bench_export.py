@@ -0,0 +1,94 @@
+"""Benchmark bulk history export at semester scale.
+
+    python benchmarks/bench_export.py [--entries 5000] [--skip-fpdf]
+
+Writes every exporter's output to a temporary file and reports wall time,
+peak Python heap and output size. For comparison it also builds the same PDF
+with FPDF, which keeps every page in memory until the end.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_core.exporters import EXPORT_FORMATS, clean_text  # noqa: E402
+
+WORDS = (
+    "gradient descent loss function overfitting regularization neuron layer "
+    "backpropagation activation entropy probability matrix vector eigenvalue"
+).split()
+
+
+def make_entries(count: int) -> list:
+    rng = random.Random(42)
+    entries = []
+    for n in range(count):
+        action = ["Summarize", "Explain", "Quiz", "Flashcard"][n % 4]
+        if action == "Flashcard":
+            content = "\n".join(
+                f"FRONT: What is {' '.join(rng.choices(WORDS, k=3))}?\nBACK: {' '.join(rng.choices(WORDS, k=12))}"
+                for _ in range(5)
+            )
+        else:
+            content = "\n\n".join(" ".join(rng.choices(WORDS, k=60)) for _ in range(4))
+        entries.append({
+            "type": action,
+            "tag": f"Week {n // 200 + 1}",
+            "timestamp": f"{n // 60 % 24:02d}:{n % 60:02d}",
+            "topic": " ".join(rng.choices(WORDS, k=12)),
+            "content": content,
+        })
+    return entries
+
+
+def fpdf_baseline(entries, out):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    for n, entry in enumerate(entries, start=1):
+        pdf.set_font("Arial", "B", 12)
+        pdf.multi_cell(0, 7, clean_text(f"{n}. {entry['type']} - {entry['tag']}"))
+        pdf.set_font("Arial", "", 10)
+        pdf.multi_cell(0, 5, clean_text(entry["content"]))
+    out.write(pdf.output(dest="S").encode("latin-1"))
+
+
+def measure(label: str, writer, entries):
+    # Time an untraced run, then trace a second run for the peak Python heap.
+    with tempfile.TemporaryFile() as out:
+        started = time.perf_counter()
+        writer(entries, out)
+        elapsed = time.perf_counter() - started
+        size = out.tell()
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        writer(entries, out)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.2f}s  peak {peak / 1e6:7.1f} MB  output {size / 1e6:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--skip-fpdf", action="store_true", help="skip the slow in-memory FPDF baseline")
+    args = parser.parse_args()
+
+    import fpdf.fonts  # noqa: F401  (import outside the measured region)
+
+    entries = make_entries(args.entries)
+    print(f"{args.entries:,} history entries\n")
+    for label, (writer, _, _) in EXPORT_FORMATS.items():
+        measure(label, writer, entries)
+    if not args.skip_fpdf:
+        measure("FPDF baseline (in memory)", fpdf_baseline, entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark PDF extraction on a generated 500-page document.
+
+    python benchmarks/bench_extract.py [--pages 500] [--workers 4]
+
+Compares the original ``text += page.extract_text()`` loop with the streaming
+extractor, sequential and with the process pool, and reports wall time and
+peak Python heap in the main process. On a single-CPU machine the extractor
+stays sequential, so the "process pool" row matches the sequential one.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_core.extract import extract_text  # noqa: E402
+
+LINE = "Gradient descent updates each weight against the slope of the loss surface. "
+
+
+def make_pdf(pages: int) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_font("Arial", "", 10)
+    for n in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, f"Page {n + 1}. " + LINE * 40)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def legacy(data: bytes) -> str:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() or ""
+    return text
+
+
+def measure(label: str, fn):
+    # Time without tracing (tracemalloc slows the main process but not workers),
+    # then run again under tracemalloc for the main-process peak heap.
+    started = time.perf_counter()
+    text = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.2f}s  peak {peak / 1e6:7.1f} MB  {len(text):>10,} chars")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    data = make_pdf(args.pages)
+    print(f"{args.pages}-page PDF, {len(data) / 1e6:.1f} MB, {args.workers} workers, {os.cpu_count()} CPUs\n")
+    base = measure("legacy (+= loop)", lambda: legacy(data))
+    seq = measure("streaming, sequential", lambda: extract_text(data, "book.pdf", workers=1))
+    par = measure("streaming, process pool", lambda: extract_text(data, "book.pdf", workers=args.workers))
+    measure("streaming, pages 1-50", lambda: extract_text(data, "book.pdf", page_spec="1-50"))
+    print(f"\nspeedup vs legacy: sequential {base / seq:.2f}x, parallel {base / par:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
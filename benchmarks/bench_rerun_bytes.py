@@ -0,0 +1,118 @@
+"""Benchmark the bytes the server sends to the browser per script run.
+
+    python benchmarks/bench_rerun_bytes.py [--reruns 20] [--app app.py]
+
+Starts ``streamlit run`` on a free port with the stub model backend, connects
+to its websocket like a browser tab would and asks for reruns, counting the
+size of every ForwardMsg until the run finishes. This goes through the real
+server, so Streamlit's own message cache (which replaces large repeated
+messages with a short reference) is included. Reports the first page load and
+the average plain rerun in the light and dark theme.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, db: str) -> subprocess.Popen:
+    env = dict(os.environ, LLM_BACKEND="stub", HISTORY_DB=db)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+         "--server.port", str(port), "--server.enableXsrfProtection", "false",
+         "--browser.gatherUsageStats", "false"],
+        cwd=os.path.dirname(app), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit did not start")
+
+
+class Tab:
+    """One browser tab: a websocket session that asks for reruns."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.toggle_id = None
+
+    async def run(self, dark: bool = False) -> int:
+        back = BackMsg()
+        back.rerun_script.query_string = "user=bench"
+        states = WidgetStates()
+        if dark and self.toggle_id:
+            state = states.widgets.add()
+            state.id = self.toggle_id
+            state.bool_value = True
+        back.rerun_script.widget_states.CopyFrom(states)
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+        sent = 0
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise RuntimeError("the server closed the websocket")
+            sent += len(data)
+            msg = ForwardMsg.FromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.new_element.WhichOneof("type") == "checkbox":
+                checkbox = msg.delta.new_element.checkbox
+                if "Dark mode" in checkbox.label:
+                    self.toggle_id = checkbox.id
+            if kind == "script_finished":
+                return sent
+
+
+async def measure(port: int, reruns: int) -> dict:
+    ws = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"])
+    tab = Tab(ws)
+    results = {"first load": await tab.run()}
+    for theme, dark in (("light", False), ("dark", True)):
+        await tab.run(dark)  # switch theme
+        results[f"rerun, {theme}"] = sum([await tab.run(dark) for _ in range(reruns)]) / reruns
+    ws.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(os.path.abspath(args.app), port, os.path.join(tmp, "bench.db"))
+        try:
+            results = asyncio.run(measure(port, args.reruns))
+        finally:
+            server.terminate()
+            server.wait()
+    for name, sent in results.items():
+        print(f"{name:<18}{sent / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
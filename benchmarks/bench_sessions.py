@@ -0,0 +1,71 @@
+"""Benchmark per-session memory and per-rerun CPU of the Streamlit script.
+
+    python benchmarks/bench_sessions.py [--sessions 100] [--reruns 5] [--app app.py]
+
+Opens ``--sessions`` sessions of the app with Streamlit's AppTest harness and
+the stub model backend, keeps them all alive, and in each one runs the first
+render, one Summarize and ``--reruns`` plain reruns. Reports process CPU per
+rerun, then, in a second pass under tracemalloc, the Python heap retained per
+open session (which includes the harness's copy of each rendered page).
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    args = parser.parse_args()
+    # The app's own modules, so another checkout (``git worktree add``) can be compared.
+    app_dir = os.path.dirname(os.path.abspath(args.app))
+    sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+
+    os.environ.update(LLM_BACKEND="stub", STUB_LATENCY="0", STUB_TOKENS_PER_SEC="0", HISTORY_DB="")
+    from streamlit.testing.v1 import AppTest
+
+    def open_session():
+        at = AppTest.from_file(args.app, default_timeout=60)
+        at.run()
+        at.text_area(key="input_text").input("Photosynthesis converts light energy into chemical energy.").run()
+        at.button[0].click().run()
+        return at
+
+    open_session()  # warm up imports and process-wide resources outside the measurement
+
+    # CPU, with all sessions kept open. tracemalloc is off here: it slows Python down several times.
+    sessions, reruns = [], []
+    for _ in range(args.sessions):
+        at = open_session()
+        for _ in range(args.reruns):
+            started = time.process_time()
+            at.run()
+            reruns.append(time.process_time() - started)
+        sessions.append(at)
+    del sessions
+    gc.collect()
+
+    # Memory: heap still held once every session has rendered and run one action.
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = [open_session() for _ in range(args.sessions)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    reruns.sort()
+    print(f"{args.sessions} sessions, {args.reruns} reruns each")
+    print(f"rerun CPU           {sum(reruns) / len(reruns) * 1e3:8.1f} ms mean, {reruns[len(reruns) // 2] * 1e3:.1f} ms median")
+    print(f"retained / session  {retained / len(sessions) / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
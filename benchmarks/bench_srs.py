@@ -0,0 +1,70 @@
+"""Benchmark the flashcard review queue on a large deck.
+
+    python benchmarks/bench_srs.py [--cards 100000] [--reviews 2000]
+
+Builds a deck in a temporary SQLite file with due dates spread over the last
+and next 30 days, then times "what is due now" queries and reviews against
+the deck's due index. For comparison it answers the same query by scanning a
+list of every card, which is what a deck without an index has to do.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_core.srs import DAY, Deck  # noqa: E402
+from study_core.storage import SQLiteKV  # noqa: E402
+
+
+def build(deck: Deck, count: int, now: int, rng: random.Random):
+    """Add ``count`` cards in batches of 500, each batch due at a random time in ``now`` ± 30 days."""
+    for start in range(0, count, 500):
+        cards = [(f"Question {n}?", f"Answer {n}.") for n in range(start, min(start + 500, count))]
+        deck.add_many(cards, now=now + rng.randint(-30 * DAY, 30 * DAY))
+
+
+def timed(label: str, runs: int, fn):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    per_call = (time.perf_counter() - started) / runs
+    print(f"{label:<40} {per_call * 1e3:9.3f} ms/op")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--reviews", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        deck = Deck(SQLiteKV(os.path.join(tmp, "deck.db")), "user:bench:")
+        started = time.perf_counter()
+        build(deck, args.cards, now, rng)
+        print(f"built {len(deck):,} cards in {time.perf_counter() - started:.1f}s\n")
+
+        index_time = timed("due now, first 20 (index)", 1000, lambda: deck.due(now, 20))
+        timed("earliest due time (index)", 1000, deck.next_due)
+
+        def review_one():
+            card = deck.due(now, 1)[0]
+            deck.review(card, rng.choice([1, 3, 4, 5]), now)
+
+        timed("fetch + review one due card", args.reviews, review_one)
+
+        # Baseline: every card in a list, filtered and sorted on each query.
+        cards = [(rng.randint(now - 30 * DAY, now + 30 * DAY), n) for n in range(args.cards)]
+        scan_time = timed("due now, first 20 (full scan)", 20, lambda: sorted(c for c in cards if c[0] <= now)[:20])
+        print(f"\nindex vs scan: {scan_time / index_time:.0f}x faster")
+        deck.kv.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark cold start: the app's imports and its first render, against a budget.
+
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 600] [--app app.py]
+
+Each run is a fresh Python process. Streamlit and the AppTest harness are
+imported first and not counted; then the process times the app's own
+top-level imports, and then the first script run (session setup and page)
+with those imports already loaded. Exits with status 1 when the median of
+imports + first render is over ``--budget-ms``, or when a module that should
+only load on first use (openai, fpdf, PyPDF2, docx2txt, numpy) was loaded by
+the time the first page was rendered.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("openai", "fpdf", "PyPDF2", "docx2txt", "numpy")
+
+CHILD = """
+import ast, json, sys, time
+app = sys.argv[1]
+import streamlit
+from streamlit.testing.v1 import AppTest
+tree = ast.parse(open(app, encoding="utf-8").read())
+imports = ast.Module([n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))], [])
+started = time.perf_counter()
+exec(compile(imports, app, "exec"), {})
+imported = time.perf_counter()
+at = AppTest.from_file(app, default_timeout=60)
+at.run()
+rendered = time.perf_counter()
+print(json.dumps({
+    "imports": (imported - started) * 1e3,
+    "first_render": (rendered - imported) * 1e3,
+    "errors": [str(e.value) for e in at.exception],
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "600")))
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    args = parser.parse_args()
+
+    app = os.path.abspath(args.app)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, HISTORY_DB=os.path.join(tmp, "startup.db"), PYTHONDONTWRITEBYTECODE="")
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-c", CHILD, app, *LAZY_MODULES],
+                cwd=os.path.dirname(app), env=env, capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    imports = statistics.median(r["imports"] for r in results)
+    first_render = statistics.median(r["first_render"] for r in results)
+    total = statistics.median(r["imports"] + r["first_render"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    errors = [e for r in results for e in r["errors"]]
+    print(f"{args.runs} cold starts (median)")
+    print(f"app imports         {imports:8.1f} ms")
+    print(f"first render        {first_render:8.1f} ms")
+    print(f"total               {total:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"loaded at startup   {', '.join(loaded) or 'none of ' + ', '.join(LAZY_MODULES)}")
+
+    failures = []
+    if errors:
+        failures.append(f"the first render raised: {errors[0]}")
+    if total > args.budget_ms:
+        failures.append(f"startup took {total:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"{', '.join(loaded)} should load on first use, not at startup")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
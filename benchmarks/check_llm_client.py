@@ -0,0 +1,180 @@
+"""Check the model client's retries against a local stub of the chat API.
+
+    python benchmarks/check_llm_client.py
+
+Serves scripted responses from an ``http.server`` on a free local port and
+points an ``LLMClient`` at it, so retry behaviour can be checked offline
+after changing ``study_core/llm_client.py``:
+
+* a chat call that gets 429 with ``Retry-After`` twice, then succeeds;
+* a stream that fails (503) before its first delta, then streams;
+* a 400, which must not be retried;
+* openai replacing a thread's expired session, which must not close the
+  shared keep-alive pool.
+
+Prints one line per check and exits with status 1 if any failed.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_core.llm_client import LLMClient  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Explain photosynthesis."}]
+
+
+def error(status: int, headers: dict = None) -> tuple:
+    body = json.dumps({"error": {"message": f"stub {status}", "type": "stub"}})
+    return status, headers or {}, body
+
+
+def reply(content: str) -> tuple:
+    body = json.dumps({"object": "chat.completion", "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]})
+    return 200, {}, body
+
+
+def stream(deltas: list) -> tuple:
+    return 200, {}, [{"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": d}}]} for d in deltas]
+
+
+class StubServer(ThreadingHTTPServer):
+    """Answers each POST with the next scripted ``(status, headers, body)``; a list body is sent as SSE."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.script = []
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+
+    def load(self, *responses):
+        with self._lock:
+            self.script = list(responses)
+            self.requests = []
+            self.connections = set()
+
+    def next_response(self, request: dict, client) -> tuple:
+        with self._lock:
+            self.requests.append(request)
+            self.connections.add(client)
+            return self.script.pop(0) if self.script else error(500)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the real API
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status, headers, body = self.server.next_response(request, self.client_address)
+        if isinstance(body, list):
+            payload = b"".join(f"data: {json.dumps(chunk)}\n\n".encode("utf-8") for chunk in body) + b"data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            payload = body.encode("utf-8")
+            content_type = "application/json"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After sent with each 429 (seconds)")
+    args = parser.parse_args()
+
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, name="stub-api", daemon=True).start()
+    failures = []
+
+    def check(label: str, ok: bool, detail: str):
+        print(f"{'ok  ' if ok else 'FAIL'} {label:<50} {detail}")
+        if not ok:
+            failures.append(label)
+
+    def client() -> LLMClient:
+        # backoff_base is tiny so the waits below come from Retry-After alone.
+        return LLMClient("sk-stub", api_base=f"http://127.0.0.1:{server.server_port}/v1", timeout=10,
+                         max_retries=3, backoff_base=0.001, backoff_max=5)
+
+    # The client imports openai on its first request; keep that out of the timing.
+    importlib.import_module("openai")
+
+    rate_limited = error(429, {"Retry-After": str(args.retry_after)})
+    server.load(rate_limited, rate_limited, reply("  Plants turn light into sugar.  "))
+    llm = client()
+    started = time.perf_counter()
+    try:
+        result = llm.chat(MESSAGES, 50, 0)
+    except Exception as e:
+        result = f"raised {type(e).__name__}: {e}"
+    waited = time.perf_counter() - started
+    check("429, 429, 200: result", result == "Plants turn light into sugar.", repr(result))
+    check("429, 429, 200: retries", llm.retries == 2 and len(server.requests) == 3,
+          f"{llm.retries} retries, {len(server.requests)} requests")
+    check("429, 429, 200: honours Retry-After", waited >= 2 * args.retry_after, f"{waited:.2f}s")
+    check("429, 429, 200: one kept-alive connection", len(server.connections) == 1,
+          f"{len(server.connections)} connections")
+
+    server.load(error(503), stream(["Plants ", "turn light ", "into sugar."]))
+    llm = client()
+    try:
+        deltas = list(llm.stream_chat(MESSAGES, 50, 0))
+    except Exception as e:
+        deltas = [f"raised {type(e).__name__}: {e}"]
+    check("503 before the first delta, then stream", deltas == ["Plants ", "turn light ", "into sugar."],
+          repr(deltas))
+    check("503, then stream: retries", llm.retries == 1 and len(server.requests) == 2,
+          f"{llm.retries} retries, {len(server.requests)} requests")
+    check("503, then stream: both requests streamed", all(r.get("stream") for r in server.requests),
+          str([r.get("stream") for r in server.requests]))
+
+    server.load(error(400), reply("unused"))
+    llm = client()
+    try:
+        llm.chat(MESSAGES, 50, 0)
+        raised = "nothing"
+    except Exception as e:
+        raised = type(e).__name__
+    check("400: raised without a retry", raised != "nothing" and llm.retries == 0 and len(server.requests) == 1,
+          f"raised {raised}, {llm.retries} retries, {len(server.requests)} requests")
+
+    # openai closes and replaces a thread's session once it is MAX_SESSION_LIFETIME_SECS
+    # old; at 0 that happens before every request, and the pool must survive it.
+    requestor = importlib.import_module("openai.api_requestor")
+    lifetime, requestor.MAX_SESSION_LIFETIME_SECS = requestor.MAX_SESSION_LIFETIME_SECS, 0
+    server.load(*[reply("ok")] * 3)
+    llm = client()
+    try:
+        for _ in range(3):
+            llm.chat(MESSAGES, 50, 0)
+    except Exception as e:
+        print(f"     (raised {type(e).__name__}: {e})")
+    finally:
+        requestor.MAX_SESSION_LIFETIME_SECS = lifetime
+    check("expired thread session: pool kept", len(server.requests) == 3 and len(server.connections) == 1,
+          f"{len(server.requests)} requests over {len(server.connections)} connections")
+
+    server.shutdown()
+    llm.close()
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nall checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Benchmark suite for the app's hot paths, with JSON baselines.
+
+    python benchmarks/suite.py [--only extract] [--repeat 5] [--save FILE] [--compare FILE]
+
+Times text extraction from TXT, DOCX and PDF fixtures of growing size, the
+single-result PDF export on large outputs, prompt building, the Quiz and
+Flashcard parsers (JSON, streaming and the older plain-text format) and whole
+script runs of the app under Streamlit's AppTest with the stub model backend.
+Fixtures are generated, so nothing is read from disk.
+
+Each case runs enough loops to take at least ``--min-time`` seconds, ``--repeat``
+times; the median and best time per call are reported. ``--save`` writes them
+as a JSON baseline and ``--compare`` checks a run against one, exiting with
+status 1 when a case got more than ``--tolerance`` slower. Baselines are only
+comparable on the same machine; ``benchmarks/baseline.json`` is a reference
+run, so make your own before changing code (or run the suite of another
+checkout, e.g. from ``git worktree add``)::
+
+    python benchmarks/suite.py --save /tmp/before.json
+    # ... change code ...
+    python benchmarks/suite.py --compare /tmp/before.json
+
+The scale scenarios (500-page PDFs, 100 sessions, large decks, cold start,
+bytes per rerun) stay in the ``bench_*.py`` scripts next to this one.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from study_core.exporters import result_pdf  # noqa: E402
+from study_core.extract import extract_text  # noqa: E402
+from study_core.parsers import JSONItemReader, format_records, parse_records, records_from_text  # noqa: E402
+from study_core.prompts import LEVEL_HINTS, STYLE_HINTS, build_prompt  # noqa: E402
+
+WORDS = (
+    "gradient descent loss function overfitting regularization neuron layer "
+    "backpropagation activation entropy probability matrix vector eigenvalue"
+).split()
+RNG = random.Random(42)
+
+
+def sentence(words: int) -> str:
+    return " ".join(RNG.choices(WORDS, k=words)).capitalize() + "."
+
+
+def paragraphs(count: int) -> list:
+    return [" ".join(sentence(12) for _ in range(5)) for _ in range(count)]
+
+
+def make_txt(kb: int) -> bytes:
+    text, out = "\n\n".join(paragraphs(40)).encode("utf-8"), b""
+    while len(out) < kb * 1024:
+        out += text
+    return out[:kb * 1024]
+
+
+def make_docx(count: int) -> bytes:
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs(count))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            "</Types>"
+        ))
+        z.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            "</Relationships>"
+        ))
+        z.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>"
+        ))
+    return buffer.getvalue()
+
+
+def make_pdf(pages: int) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_font("Arial", "", 10)
+    for n, text in enumerate(paragraphs(pages), start=1):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, f"Page {n}. " + text * 6)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def quiz_reply(count: int) -> str:
+    questions = [
+        {"question": sentence(10)[:-1] + "?", "options": [sentence(4) for _ in range(4)],
+         "answer": RNG.choice("ABCD"), "explanation": sentence(14)}
+        for _ in range(count)
+    ]
+    return json.dumps({"questions": questions}, indent=1)
+
+
+def flashcard_reply(count: int) -> str:
+    cards = [{"front": sentence(6)[:-1] + "?", "back": sentence(16)} for _ in range(count)]
+    return json.dumps({"cards": cards}, indent=1)
+
+
+def stream(reply: str, step: int = 12):
+    """Feed a reply to ``JSONItemReader`` in small deltas, as while streaming."""
+    reader = JSONItemReader()
+    return [item for n in range(0, len(reply), step) for item in reader.feed(reply[n:n + step])]
+
+
+def core_cases():
+    """``(name, function)`` for the functions the app calls on every action."""
+    cases = []
+    for kb in (100, 1000, 10000):
+        data = make_txt(kb)
+        cases.append((f"extract/txt-{kb}kb", lambda data=data: extract_text(data, "notes.txt")))
+    for count in (100, 1000, 5000):
+        data = make_docx(count)
+        cases.append((f"extract/docx-{count}p", lambda data=data: extract_text(data, "notes.docx")))
+    for pages in (10, 50, 200):
+        data = make_pdf(pages)
+        cases.append((f"extract/pdf-{pages}pages", lambda data=data: extract_text(data, "notes.pdf", workers=1)))
+
+    notes = "\n\n".join(paragraphs(20))
+    for kb in (10, 100):
+        output = make_txt(kb).decode("utf-8")
+        cases.append((f"export/result-pdf-{kb}kb", lambda output=output: result_pdf(notes, output, "Summarize")))
+
+    small, large = notes[:2000], make_txt(400).decode("utf-8")
+    levels, styles = ["Auto", *LEVEL_HINTS], ["Default", *STYLE_HINTS]
+    cases.append(("prompt/build-all-2kb", lambda: [
+        build_prompt(a, small, lv, st) for a in ("Summarize", "Explain", "Quiz", "Flashcard")
+        for lv in levels for st in styles
+    ]))
+    cases.append(("prompt/build-400kb", lambda: build_prompt("Explain", large, "Advanced", "With Examples")))
+
+    for count in (10, 100):
+        quiz, cards = quiz_reply(count), flashcard_reply(count)
+        cases.append((f"parse/quiz-json-{count}", lambda quiz=quiz: parse_records("Quiz", quiz)))
+        cases.append((f"parse/flashcards-json-{count}", lambda cards=cards: parse_records("Flashcard", cards)))
+        cases.append((f"parse/quiz-stream-{count}", lambda quiz=quiz: stream(quiz)))
+        quiz_text = format_records("Quiz", parse_records("Quiz", quiz)[0])
+        cards_text = format_records("Flashcard", parse_records("Flashcard", cards)[0])
+        cases.append((f"parse/quiz-text-{count}", lambda t=quiz_text: records_from_text("Quiz", t)))
+        cases.append((f"parse/flashcards-text-{count}", lambda t=cards_text: records_from_text("Flashcard", t)))
+    return cases
+
+
+def app_cases():
+    """Whole script runs with AppTest and the stub backend (no network, no delays)."""
+    os.environ.update(LLM_BACKEND="stub", STUB_LATENCY="0", STUB_TOKENS_PER_SEC="0", HISTORY_DB="")
+    os.chdir(ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    def first_render():
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+        at.run()
+        return at
+
+    def click(at, label: str, text: str):
+        at.text_area(key="input_text").input(text)
+        next(b for b in at.button if label in b.label).click().run()
+
+    notes = "\n\n".join(paragraphs(6))
+    session = first_render()  # also warms up imports and process-wide resources
+    click(session, "Summarize", notes)
+    calls = iter(range(10**9))
+
+    def fresh_quiz():
+        # A different text each time, so the reply is not served from the response cache.
+        click(session, "Quiz", f"{notes}\n\nRun {next(calls)}.")
+
+    return [
+        ("app/first-render", first_render),
+        ("app/rerun", session.run),
+        ("app/quiz-stub", fresh_quiz),
+    ]
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    fn()  # warm-up, also fills lazy imports
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - started) / loops)
+    return {"median": statistics.median(times), "min": min(times), "loops": loops, "repeat": repeat}
+
+
+def machine() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:8.2f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds * 1e6:8.1f} µs"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print each case against the baseline; returns the names that got slower."""
+    print(f"\ncompared with {baseline['machine'].get('commit') or 'baseline'} "
+          f"from {baseline['machine'].get('date', '?')} (tolerance {tolerance:.0%})")
+    if baseline["machine"].get("platform") != platform.platform():
+        print("note: the baseline was made on another machine; ratios are only indicative")
+    slower = []
+    for name, now in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<30} {format_time(now['median'])}   (new)")
+            continue
+        ratio = now["median"] / before["median"]
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = "  SLOWER"
+            slower.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            mark = "  faster"
+        print(f"{name:<30} {format_time(before['median'])} -> {format_time(now['median'])}  {ratio:5.2f}x{mark}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default="", help="run the cases whose name contains this (e.g. parse/, app/)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat (default: %(default)s)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default: %(default)s)")
+    args = parser.parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    cases = [case for case in core_cases() if args.only in case[0]]
+    if args.only in "app/" or args.only.startswith("app/"):  # skip starting the app when it is filtered out
+        cases += [case for case in app_cases() if args.only in case[0]]
+    results = {}
+    for name, fn in cases:
+        results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:<30} {format_time(results[name]['median'])}  (best {format_time(results[name]['min']).strip()})",
+              flush=True)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"\nsaved {len(results)} results to {args.save}")
+    if baseline:
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print(f"FAIL: {len(slower)} case(s) slower than the baseline: {', '.join(slower)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Smart Study Assistant without the UI.
+
+``app.py`` is the Streamlit front end over these modules; nothing in here
+imports Streamlit, so the same code runs in scripts, benchmarks and the batch
+CLI (``python -m study_core.batch``).
+
+* ``actions`` - prompt budget, model calls and structured results for each action.
+* ``extract`` - text from PDF, DOCX and TXT files.
+* ``prompts`` - the prompt templates.
+* ``llm_backends`` / ``llm_client`` / ``llm_cache`` - model access and caching.
+* ``parsers`` - Quiz and Flashcard records.
+* ``exporters`` - PDF, Markdown and Anki exports.
+* ``metrics`` - timing spans, Prometheus text and JSON span logs.
+* ``history_store``, ``storage``, ``srs``, ``dedup``, ``retrieval``,
+  ``summarize``, ``tokens`` - the supporting pieces.
+"""
@@ -0,0 +1,202 @@
+"""The study actions without a UI: prompt, budget, model call, structured result.
+
+Nothing here touches Streamlit, so the app, the batch CLI and scripts share
+one pipeline. Everything a call needs travels in ``ChatSettings``; every
+function is safe to call from worker threads.
+"""
+import hashlib
+import time
+from collections import namedtuple
+
+from . import metrics
+from .llm_cache import make_key
+from .parsers import RECORD_TYPES, format_records, parse_records, records_from_text
+from .prompts import JSON_SHAPES, REPAIR_PROMPT, chat_messages
+from .retrieval import BM25Index
+from .summarize import map_reduce_summarize
+from .tokens import context_window, estimate_tokens, fit_to_budget, message_tokens
+
+ACTIONS = ("Summarize", "Explain", "Quiz", "Flashcard")
+# Actions that can work from the passages matching a topic instead of the whole text.
+RETRIEVAL_ACTIONS = ("Explain", "Quiz", "Flashcard")
+# Slack for estimation error between the prompt and the requested output.
+BUDGET_MARGIN_TOKENS = 64
+
+# Everything a model call needs: a response cache, a ChatBackend and a TokenMeter.
+ChatSettings = namedtuple("ChatSettings", ["max_tokens", "temperature", "cache", "backend", "meter"])
+
+MISSING_KEY_ERROR = "❌ Error: OPENAI_API_KEY is missing. Set it in your .env file (not in GitHub)."
+
+
+def complete(prompt: str, settings: ChatSettings) -> str:
+    """Run one chat completion; failures come back as an ``❌ Error: ...`` string."""
+    backend = settings.backend
+    if not backend.ready:
+        return MISSING_KEY_ERROR
+    messages = chat_messages(prompt)
+    key = make_key(backend.model, messages, max_tokens=settings.max_tokens, temperature=settings.temperature)
+    with metrics.span("llm_call", backend=backend.name, stream=False) as span:
+        cached = settings.cache.get(key)
+        if cached is not None:
+            _record_call(span, cache_hit=True)
+            return cached
+        try:
+            result = backend.chat(messages, settings.max_tokens, settings.temperature)
+        except Exception as e:
+            _record_call(span, error=type(e).__name__)
+            return f"❌ Error: {e}"
+        _record_call(span, settings.meter, message_tokens(messages), estimate_tokens(result))
+    settings.cache.set(key, result)
+    return result
+
+
+def stream_complete(prompt: str, settings: ChatSettings):
+    """Yield a chat completion as text deltas, caching the full text once it is done."""
+    backend = settings.backend
+    if not backend.ready:
+        yield MISSING_KEY_ERROR
+        return
+    messages = chat_messages(prompt)
+    key = make_key(backend.model, messages, max_tokens=settings.max_tokens, temperature=settings.temperature)
+    with metrics.span("llm_call", backend=backend.name, stream=True) as span:
+        cached = settings.cache.get(key)
+        if cached is not None:
+            _record_call(span, cache_hit=True)
+            yield cached
+            return
+        parts = []
+        started = time.perf_counter()
+        try:
+            for delta in backend.stream_chat(messages, settings.max_tokens, settings.temperature):
+                if not parts:
+                    span.set(ttft=time.perf_counter() - started)
+                    metrics.observe("study_llm_ttft_seconds", span.fields["ttft"], backend=backend.name)
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            _record_call(span, error=type(e).__name__)
+            yield ("\n\n" if parts else "") + f"❌ Error: {e}"
+            return
+        result = "".join(parts).strip()
+        _record_call(span, settings.meter, message_tokens(messages), estimate_tokens(result))
+    settings.cache.set(key, result)
+
+
+def _record_call(span, meter=None, prompt_tokens: int = 0, completion_tokens: int = 0, cache_hit: bool = False,
+                 error: str = None):
+    """Put one model call's outcome on its span, the process counters and the session's meter."""
+    span.set(cache_hit=cache_hit)
+    outcome = "hit" if cache_hit else "error" if error else "miss"
+    metrics.inc("study_llm_calls_total", backend=span.fields["backend"], cache=outcome)
+    if error:
+        span.set(error=error)
+    if meter is not None:
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        meter.record(prompt_tokens, completion_tokens)
+        metrics.inc("study_llm_tokens_total", prompt_tokens, kind="prompt")
+        metrics.inc("study_llm_tokens_total", completion_tokens, kind="completion")
+
+
+def fit_input(prefix: str, text: str, settings: ChatSettings):
+    """Fit ``prefix + text`` into the model window next to the requested output.
+
+    Returns ``(text, settings, notes)``: the response length is capped when it
+    would take more than half the window, and the text is squeezed or trimmed
+    to the room that is left. ``notes`` says what was changed, for a warning.
+    """
+    room, settings, notes = input_room(prefix, settings)
+    text, trimmed = fit_to_budget(text, room)
+    return text, settings, notes + trimmed
+
+
+def input_room(prefix: str, settings: ChatSettings):
+    """Tokens left for the text after ``prefix``; returns ``(room, settings, notes)`` as ``fit_input``."""
+    window = context_window(settings.backend.model)
+    notes = []
+    if settings.max_tokens > window // 2:
+        settings = settings._replace(max_tokens=window // 2)
+        notes.append(f"capped the response at {settings.max_tokens:,} tokens")
+    room = window - settings.max_tokens - message_tokens(chat_messages(prefix)) - BUDGET_MARGIN_TOKENS
+    return room, settings, notes
+
+
+def focus_text(action: str, text: str, query: str, cache=None, min_tokens: int = 3000,
+               passage_tokens: int = 300, top_k: int = 6):
+    """For long documents, keep only the passages most relevant to ``query``.
+
+    Returns ``(text, passages used, passages total)``; the counts are ``None``
+    when the text is sent whole. ``cache`` (an ``LRUCache``) keeps built
+    indexes by document hash.
+    """
+    if action not in RETRIEVAL_ACTIONS or not query.strip() or estimate_tokens(text) <= min_tokens:
+        return text, None, None
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    index = cache.get(key) if cache is not None else None
+    if index is None:
+        index = BM25Index.from_text(text, passage_tokens)
+        if cache is not None:
+            cache.set(key, index)
+    passages = index.top_passages(query, top_k)
+    if not passages:
+        return text, None, None
+    return "\n\n[...]\n\n".join(passages), len(passages), len(index.passages)
+
+
+def structure_result(action: str, raw: str, settings: ChatSettings):
+    """Validate a Quiz/Flashcard reply into typed records, with one small repair call if needed.
+
+    Returns ``(content, items)``: the records' plain-text form and the records,
+    or the reply unchanged and ``None`` for other actions and unusable replies.
+    """
+    if action not in RECORD_TYPES or raw.startswith("❌"):
+        return raw, None
+    records, error = parse_records(action, raw)
+    if error:
+        # Only the broken reply goes back, not the source text.
+        repaired = complete(REPAIR_PROMPT.format(shape=JSON_SHAPES[action], error=error, reply=raw), settings)
+        if not repaired.startswith("❌"):
+            records, _ = parse_records(action, repaired)
+    if not records:
+        records = records_from_text(action, raw)
+    return (format_records(action, records), records) if records else (raw, None)
+
+
+def summarize_sections(text: str, settings: ChatSettings, chunk_tokens: int = 2500, concurrency: int = 4,
+                       on_progress=None, merged_tokens: int = None):
+    """Map step of a large summary; returns ``(merged partials, error)`` as ``map_reduce_summarize``."""
+    return map_reduce_summarize(
+        text,
+        lambda p: complete(p, settings),
+        chunk_tokens=chunk_tokens,
+        concurrency=concurrency,
+        on_progress=on_progress,
+        merged_tokens=merged_tokens,
+    )
+
+
+def run_action(action: str, text: str, prompt_prefix: str, settings: ChatSettings, chunk_tokens: int = 2500,
+               concurrency: int = 4):
+    """Run one action on already focused text; returns ``(content, items, notes)``.
+
+    ``prompt_prefix`` is ``build_prompt(action, "", ...)`` and the prompt is
+    ``prompt_prefix + text``, as in the app's single actions, so both share
+    response-cache entries.
+
+    A Summarize that does not fit the model window in one prompt goes through
+    map-reduce first, in sections of ``chunk_tokens``. The text (or the merged
+    section summaries) is fitted to the window; ``notes`` says what that
+    changed, as for ``fit_input``.
+    """
+    room, settings, notes = input_room(prompt_prefix, settings)
+    if action == "Summarize" and estimate_tokens(text) > room:
+        text, error = summarize_sections(text, settings, chunk_tokens, concurrency, merged_tokens=room)
+        if error:
+            return error, None, []
+    text, trimmed = fit_to_budget(text, room)
+    notes += trimmed
+    return (*structure_result(action, complete(prompt_prefix + text, settings), settings), notes)
+
+
+def token_counts(meter) -> dict:
+    totals = meter.snapshot()
+    return {"prompt_tokens": totals["prompt_tokens"], "completion_tokens": totals["completion_tokens"]}
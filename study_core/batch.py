@@ -0,0 +1,238 @@
+"""Run study actions over a whole folder of notes from the command line.
+
+    python -m study_core.batch NOTES_DIR [--out study_output] [--actions Summarize,Quiz]
+
+Every PDF, DOCX and TXT file under ``NOTES_DIR`` is extracted in a process
+pool (a bounded number of files ahead) and each requested action runs in a
+thread pool of ``--concurrency`` model calls. Results are appended to
+``OUT/results.jsonl``, one line per file and action, and each result is also
+written as ``OUT/pdf/<file>.<action>.pdf``.
+
+``OUT/checkpoint.db`` records every finished file and action together with
+the file's size and modification time; a re-run skips those and only does
+what is missing, failed, or belongs to a file that changed since. A result is
+checkpointed after its JSONL line is written, so an interrupted run can at
+worst repeat a line; the last line for a file and action is the current one.
+
+``METRICS_LOG`` and ``METRICS_PORT`` work as in the app (JSON span logs and a
+Prometheus endpoint for the length of the run).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from . import metrics
+from .actions import ACTIONS, ChatSettings, focus_text, run_action, token_counts
+from .exporters import result_pdf
+from .extract import extract_text
+from .llm_backends import backend_from_env
+from .llm_cache import LRUCache, ResponseCache
+from .prompts import LEVEL_HINTS, STYLE_HINTS, build_prompt
+from .storage import SQLiteKV
+from .tokens import TokenMeter
+
+NOTE_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+
+def find_notes(root: str, skip: str = None) -> list:
+    """Paths of every note file under ``root``, in a stable order, outside the folder ``skip``.
+
+    ``skip`` is the output folder: its PDFs must not be read back as notes
+    when it sits inside ``root``.
+    """
+    skip = os.path.realpath(skip) if skip else None
+    found = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(name for name in dirs if os.path.realpath(os.path.join(folder, name)) != skip)
+        found += [os.path.join(folder, name) for name in sorted(files) if name.lower().endswith(NOTE_EXTENSIONS)]
+    return found
+
+
+def fingerprint(path: str) -> bytes:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii")
+
+
+def read_notes(path: str, max_chars: int) -> str:
+    """Runs in an extraction worker process."""
+    metrics.configure_logging(os.getenv("METRICS_LOG", ""))
+    with open(path, "rb") as f:
+        data = f.read()
+    # One file per worker; the per-file page pool would only oversubscribe the CPUs.
+    return extract_text(data, path, max_chars=max_chars, workers=1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m study_core.batch", description=__doc__.splitlines()[0])
+    parser.add_argument("notes", help="folder of PDF, DOCX and TXT notes (searched recursively)")
+    parser.add_argument("--out", default="study_output", help="output folder (default: %(default)s)")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help="comma-separated (default: all four)")
+    parser.add_argument("--level", default="Auto", choices=["Auto", *LEVEL_HINTS])
+    parser.add_argument("--style", default="Default", choices=["Default", *STYLE_HINTS])
+    parser.add_argument("--topic", default="", help="focus long files on the passages matching this topic")
+    parser.add_argument("--max-tokens", type=int, default=300, help="response length (default: %(default)s)")
+    parser.add_argument("--temperature", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="extraction processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="model calls in flight")
+    parser.add_argument("--no-pdf", action="store_true", help="write results.jsonl only")
+    parser.add_argument("--max-chars", type=int, default=int(os.getenv("EXTRACT_MAX_CHARS", "2000000")))
+    parser.add_argument("--summary-chunk-tokens", type=int, default=int(os.getenv("SUMMARY_CHUNK_TOKENS", "2500")))
+    parser.add_argument("--retrieval-min-tokens", type=int, default=int(os.getenv("RETRIEVAL_MIN_TOKENS", "3000")))
+    args = parser.parse_args(argv)
+    args.actions = [a.strip() for a in args.actions.split(",") if a.strip()]
+    unknown = [a for a in args.actions if a not in ACTIONS]
+    if unknown or not args.actions:
+        parser.error(f"--actions takes {', '.join(ACTIONS)}; got {', '.join(unknown) or 'none'}")
+    return args
+
+
+class Batch:
+    def __init__(self, args, settings: ChatSettings):
+        self.args = args
+        self.settings = settings
+        self.indexes = LRUCache(max_entries=max(8, args.concurrency * 2))
+        os.makedirs(args.out, exist_ok=True)
+        self.checkpoint = SQLiteKV(os.path.join(args.out, "checkpoint.db"))
+        self.results = open(os.path.join(args.out, "results.jsonl"), "a", encoding="utf-8")
+        self.done = self.failed = 0
+
+    def pending(self, files: list):
+        """``(relative path, path, fingerprint, actions still to run)`` for files with work left."""
+        for path in files:
+            rel = os.path.relpath(path, self.args.notes)
+            mark = fingerprint(path)
+            todo = [a for a in self.args.actions if self.checkpoint.get(f"done:{a}:{rel}") != mark]
+            if todo:
+                yield rel, path, mark, todo
+
+    def run_one(self, rel: str, action: str, text: str) -> dict:
+        """One action on one file; runs on a model-pool thread."""
+        args = self.args
+        settings = self.settings._replace(meter=TokenMeter())
+        with metrics.span("prompt", action=action):
+            prefix = build_prompt(action, "", args.level, args.style)
+            source = focus_text(action, text, args.topic, self.indexes, args.retrieval_min_tokens)[0]
+        started = time.perf_counter()
+        # Map-reduce sections run one at a time: --concurrency alone bounds the calls in flight.
+        content, items, notes = run_action(action, source, prefix, settings, args.summary_chunk_tokens, 1)
+        result = {
+            "file": rel,
+            "action": action,
+            "content": content,
+            "items": [item._asdict() for item in items] if items else None,
+            "notes": notes,
+            "seconds": round(time.perf_counter() - started, 3),
+            **token_counts(settings.meter),
+        }
+        if content.startswith("❌"):
+            result["error"] = True
+        elif not args.no_pdf:
+            pdf_path = os.path.join(args.out, "pdf", f"{rel}.{action.lower()}.pdf")
+            os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+            with open(pdf_path, "wb") as f:
+                f.write(result_pdf(rel, content, action))
+        return result
+
+    def record(self, result: dict, mark: bytes, total: int):
+        self.results.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.results.flush()
+        if result.get("error"):
+            self.failed += 1
+        else:
+            self.checkpoint.write({f"done:{result['action']}:{result['file']}": mark})
+        self.done += 1
+        status = "failed" if result.get("error") else f"{result.get('seconds', 0):.1f}s"
+        print(f"[{self.done}/{total}] {result['file']} · {result['action']} · {status}", flush=True)
+
+    def run(self, files: list) -> int:
+        args = self.args
+        work = list(self.pending(files))
+        total = sum(len(todo) for *_, todo in work)
+        print(f"{len(files)} files, {len(files) - len(work)} already done, {total} results to make", flush=True)
+        # "spawn": forking after the model pool has started threads is unsafe.
+        extractors = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn"))
+        callers = ThreadPoolExecutor(args.concurrency)
+        queue = iter(work)
+        extracting, calls = deque(), {}
+        interrupted = False
+
+        def top_up():
+            while len(extracting) < args.workers * 2:
+                job = next(queue, None)
+                if job is None:
+                    return
+                extracting.append((job, extractors.submit(read_notes, job[1], args.max_chars)))
+
+        def collect(finished):
+            for future in finished:
+                rel, action, mark = calls.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Not checkpointed, like a failed extraction: the next run retries it.
+                    result = {"file": rel, "action": action, "content": f"❌ Error: {e}", "error": True}
+                self.record(result, mark, total)
+
+        try:
+            top_up()
+            while extracting or calls:
+                collect([f for f in calls if f.done()])
+                # Only extract ahead while the model pool has work queued for at most two rounds.
+                if extracting and len(calls) < args.concurrency * 2:
+                    (rel, _, mark, todo), future = extracting.popleft()
+                    top_up()
+                    try:
+                        text = future.result()
+                        error = None if text.strip() else "❌ Error: no text found in the file"
+                    except Exception as e:
+                        error = f"❌ Error: Could not read file: {e}"
+                    for action in todo:
+                        if error:
+                            self.record({"file": rel, "action": action, "content": error, "error": True}, mark, total)
+                        else:
+                            calls[callers.submit(self.run_one, rel, action, text)] = (rel, action, mark)
+                    continue
+                finished, _ = wait(list(calls), return_when=FIRST_COMPLETED)
+                collect(finished)
+        except KeyboardInterrupt:
+            interrupted = True
+            print("Interrupted; finished results are checkpointed, re-run to resume.", file=sys.stderr)
+        finally:
+            extractors.shutdown(wait=not interrupted, cancel_futures=True)
+            callers.shutdown(wait=not interrupted, cancel_futures=True)
+            self.results.close()
+            self.checkpoint.close()
+        print(f"{self.done - self.failed} results written, {self.failed} failed", flush=True)
+        return 130 if interrupted else (1 if self.failed else 0)
+
+
+def main(argv=None) -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = parse_args(argv)
+    metrics.start_from_env()
+    if not os.path.isdir(args.notes):
+        print(f"{args.notes} is not a folder", file=sys.stderr)
+        return 2
+    settings = ChatSettings(
+        args.max_tokens,
+        args.temperature,
+        ResponseCache(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+            db_path=os.getenv("LLM_CACHE_DB") or None,
+        ),
+        backend_from_env(),
+        None,
+    )
+    return Batch(args, settings).run(find_notes(args.notes, skip=args.out))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Near-duplicate detection for flashcards and quiz questions (MinHash + LSH).
+
+Each text is normalised (case, punctuation, whitespace) and cut into
+character shingles; a MinHash signature of ``num_perm`` values estimates the
+Jaccard similarity between two shingle sets. Signatures are split into bands
+and each band is stored as a key ``lsh:<band>:<band value>:<item id>`` in a
+``storage.KVStore``, so finding candidates is one prefix scan per band
+however large the deck is. Candidates are confirmed by comparing their full
+signatures against ``threshold``.
+
+numpy is imported on the first signature, not with the module, so opening a
+page that never adds a card does not pay for it.
+"""
+import re
+import zlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy
+
+_PRIME = (1 << 31) - 1
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text.lower())).strip()
+
+
+def shingles(text: str, size: int = 4) -> "numpy.ndarray":
+    """Stable 31-bit hashes of the character ``size``-grams of the normalised text."""
+    import numpy as np
+
+    text = normalize(text)
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) & _PRIME for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateIndex:
+    def __init__(self, kv, namespace: str = "", num_perm: int = 64, bands: int = 16, threshold: float = 0.7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.kv = kv
+        self.namespace = namespace
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._a = self._b = None
+
+    def signature(self, text: str) -> "numpy.ndarray":
+        import numpy as np
+
+        if self._a is None:
+            # Fixed seed: signatures are persisted, so the hash family must not change between runs.
+            rng = np.random.default_rng(1)
+            self._a = rng.integers(1, _PRIME, size=(self.num_perm, 1), dtype=np.uint64)
+            self._b = rng.integers(0, _PRIME, size=(self.num_perm, 1), dtype=np.uint64)
+        # a, b, x < 2**31, so a * x + b fits in 64 bits without overflow.
+        return ((self._a * shingles(text) + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: "numpy.ndarray") -> list:
+        return [
+            f"{self.namespace}lsh:{band:02d}:{signature[band * self.rows:(band + 1) * self.rows].tobytes().hex()}:"
+            for band in range(self.bands)
+        ]
+
+    def find(self, text: str, signature: "numpy.ndarray" = None):
+        """``(item id, estimated similarity)`` of the closest near-duplicate, or ``None``."""
+        import numpy as np
+
+        signature = self.signature(text) if signature is None else signature
+        candidates = set()
+        for prefix in self._band_keys(signature):
+            candidates.update(key[len(prefix):] for key, _ in self.kv.scan(prefix))
+        best = None
+        for item_id in candidates:
+            stored = self.kv.get(f"{self.namespace}sig:{item_id}")
+            if stored is None:
+                continue
+            similarity = float(np.mean(np.frombuffer(stored, dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (item_id, similarity)
+        return best
+
+    def entries(self, item_id: str, signature: "numpy.ndarray") -> dict:
+        """The puts that index ``item_id``, for callers that batch them with their own writes."""
+        puts = {prefix + item_id: b"" for prefix in self._band_keys(signature)}
+        puts[f"{self.namespace}sig:{item_id}"] = signature.tobytes()
+        return puts
+
+    def check_and_add(self, item_id: str, text: str):
+        """Index ``text`` unless it nearly duplicates an indexed item; returns that item's match or ``None``."""
+        signature = self.signature(text)
+        match = self.find(text, signature)
+        if match is None:
+            self.kv.write(self.entries(item_id, signature))
+        return match
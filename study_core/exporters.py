@@ -0,0 +1,214 @@
+"""Export session history: one multi-section PDF, a Markdown bundle, an Anki CSV.
+
+``result_pdf`` builds the single-result PDF offered next to each answer.
+
+Every exporter takes an iterable of history entries and writes to a binary
+file object as it goes, so memory stays flat however many entries there are.
+The PDF writer emits each page (a compressed content stream plus its page
+object) as soon as it is full and only keeps object offsets until the end.
+"""
+import csv
+import io
+import re
+import zipfile
+import zlib
+from datetime import datetime
+
+from . import metrics
+from .parsers import records_from_text
+
+
+def clean_text(text: str) -> str:
+    text = text.replace("✅", "[OK]").replace("❌", "[ERROR]").replace("🤔", "")
+    return text.encode("ascii", "ignore").decode("ascii")
+
+
+def result_pdf(input_text: str, output_text: str, action_type: str) -> bytes:
+    """One result (its input and output) as a PDF, built in memory with FPDF."""
+    with metrics.span("pdf", chars=len(input_text) + len(output_text)) as span:
+        data = _result_pdf(input_text, output_text, action_type)
+        span.set(bytes=len(data))
+    return data
+
+
+def _result_pdf(input_text: str, output_text: str, action_type: str) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Smart Study Assistant", ln=True, align="C")
+    pdf.ln(3)
+
+    pdf.set_font("Arial", "I", 11)
+    pdf.cell(0, 8, f"Type: {action_type}", ln=True, align="C")
+    pdf.ln(2)
+    pdf.set_font("Arial", "", 9)
+    pdf.cell(0, 6, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="C")
+    pdf.ln(6)
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 7, "Input:", ln=True)
+    pdf.set_font("Arial", "", 10)
+    pdf.multi_cell(0, 5, clean_text(input_text))
+    pdf.ln(3)
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 7, "Output:", ln=True)
+    pdf.set_font("Arial", "", 10)
+    pdf.multi_cell(0, 5, clean_text(output_text))
+
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class StreamingPDF:
+    """Minimal text-only PDF writer that streams page by page (Helvetica, A4)."""
+
+    FONTS = {False: ("F1", "helvetica"), True: ("F2", "helveticaB")}
+
+    def __init__(self, out, width: float = 595.28, height: float = 841.89, margin: float = 50):
+        from fpdf.fonts import fpdf_charwidths
+
+        self.out = out
+        self.width, self.height, self.margin = width, height, margin
+        self.widths = {bold: fpdf_charwidths[name] for bold, (_, name) in self.FONTS.items()}
+        self.offsets = {}
+        self.kids = []
+        self.position = 0
+        self.next_id = 5  # 1 catalog, 2 page tree, 3-4 fonts
+        self.ops = []
+        self.y = height - margin
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id: int, body: bytes):
+        self.offsets[obj_id] = self.position
+        self._write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def _flush_page(self):
+        if not self.ops:
+            return
+        stream = zlib.compress("\n".join(self.ops).encode("latin-1"))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(
+            content_id,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        )
+        self._object(page_id, b"<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>" % content_id)
+        self.kids.append(page_id)
+        self.ops = []
+        self.y = self.height - self.margin
+
+    def _text_width(self, text: str, size: float, bold: bool) -> float:
+        widths = self.widths[bold]
+        return sum(widths.get(ch, 556) for ch in text) * size / 1000
+
+    def _wrap(self, text: str, size: float, bold: bool):
+        limit = self.width - 2 * self.margin
+        space = self._text_width(" ", size, bold)
+        for raw_line in text.split("\n"):
+            line, line_width = "", 0.0
+            for word in raw_line.split(" "):
+                word_width = self._text_width(word, size, bold)
+                if line and line_width + space + word_width <= limit:
+                    line, line_width = f"{line} {word}", line_width + space + word_width
+                    continue
+                if line:
+                    yield line
+                # Break words that are wider than the whole line.
+                while word_width > limit:
+                    cut = max(1, int(len(word) * limit / word_width))
+                    yield word[:cut]
+                    word = word[cut:]
+                    word_width = self._text_width(word, size, bold)
+                line, line_width = word, word_width
+            yield line
+
+    def text(self, text: str, size: float = 10, bold: bool = False, after: float = 4):
+        font = self.FONTS[bold][0]
+        leading = size * 1.35
+        for line in self._wrap(clean_text(text), size, bold):
+            if self.y - leading < self.margin:
+                self._flush_page()
+            self.y -= leading
+            self.ops.append(f"BT /{font} {size} Tf {self.margin} {self.y:.2f} Td ({_escape(line)}) Tj ET")
+        self.y -= after
+
+    def close(self):
+        self._flush_page()
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        kids = b" ".join(b"%d 0 R" % k for k in self.kids)
+        self._object(
+            2,
+            b"<< /Type /Pages /Kids [" + kids + b"] /Count %d /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (len(self.kids), self.width, self.height),
+        )
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self.position
+        size = self.next_id
+        rows = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        for obj_id in range(1, size):
+            rows.append(b"%010d 00000 n \n" % self.offsets[obj_id])
+        self._write(b"".join(rows))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_at))
+
+
+def export_history_pdf(entries, out):
+    pdf = StreamingPDF(out)
+    pdf.text("Smart Study Assistant - Session history", size=16, bold=True, after=10)
+    for n, entry in enumerate(entries, start=1):
+        pdf.text(f"{n}. {entry['type']} - {entry.get('tag', 'General')}", size=12, bold=True, after=2)
+        pdf.text(f"{entry['timestamp']} | {entry['topic']}", size=8, after=4)
+        pdf.text(entry["content"], size=10, after=12)
+    pdf.close()
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:40] or "entry"
+
+
+def export_history_markdown(entries, out):
+    """Zip with one Markdown file per entry plus an index.md linking them."""
+    index = ["# Smart Study Assistant - Session history", ""]
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for n, entry in enumerate(entries, start=1):
+            name = f"{n:04d}-{_slug(entry['type'])}-{_slug(entry.get('tag', ''))}.md"
+            body = (
+                f"# {entry['type']}: {entry.get('tag', 'General')}\n\n"
+                f"_{entry['timestamp']}_ · {entry['topic']}\n\n{entry['content']}\n"
+            )
+            bundle.writestr(name, body)
+            index.append(f"{n}. [{entry['type']} - {entry.get('tag', 'General')}]({name})")
+        bundle.writestr("index.md", "\n".join(index) + "\n")
+
+
+def export_flashcards_csv(entries, out):
+    """Anki-importable CSV (Front, Back, Tags) of every card in Flashcard entries."""
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    for entry in entries:
+        if entry["type"] != "Flashcard":
+            continue
+        tag = _slug(entry.get("tag", "")).replace("-", "_")
+        for front, back in entry.get("items") or records_from_text("Flashcard", entry["content"]):
+            writer.writerow([front, back, tag])
+    text.flush()
+    text.detach()
+
+
+# label -> (writer, file extension, MIME type)
+EXPORT_FORMATS = {
+    "PDF (all sections)": (export_history_pdf, "pdf", "application/pdf"),
+    "Markdown bundle (.zip)": (export_history_markdown, "zip", "application/zip"),
+    "Anki flashcards (.csv)": (export_flashcards_csv, "csv", "text/csv"),
+}
@@ -0,0 +1,115 @@
+"""Text extraction for uploaded notes (PDF, DOCX, TXT).
+
+PDF pages are yielded lazily, optionally for a page range only. Large PDFs are
+split across a process pool whose workers each parse the document once and
+then extract batches of pages; only a bounded number of batches is in flight
+so memory stays flat however long the book is. DOCX files are read from memory
+instead of a temp file.
+"""
+import io
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+
+PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", "100"))
+PAGE_BATCH = 16
+
+_worker_reader = None
+
+
+def parse_page_range(spec: str, page_count: int) -> list:
+    """Turn "1-5, 8, 10-" into 0-based page indices; empty means every page."""
+    if not spec or not spec.strip():
+        return list(range(page_count))
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d*)\s*-\s*(\d*)|(\d+)", part)
+        if not match:
+            raise ValueError(f"Invalid page range: {part!r}")
+        if match.group(3):
+            start = end = int(match.group(3))
+        else:
+            start = int(match.group(1) or 1)
+            end = int(match.group(2) or page_count)
+        start, end = max(start, 1), min(end, page_count)
+        pages.extend(range(start - 1, end))
+    return sorted(set(pages))
+
+
+def _pdf_reader(data: bytes):
+    from PyPDF2 import PdfReader
+
+    return PdfReader(io.BytesIO(data))
+
+
+def iter_pdf_pages(reader, pages: list = None):
+    for index in range(len(reader.pages)) if pages is None else pages:
+        yield reader.pages[index].extract_text() or ""
+
+
+def _init_worker(data: bytes):
+    global _worker_reader
+    _worker_reader = _pdf_reader(data)
+
+
+def _extract_batch(indices: list) -> list:
+    return [_worker_reader.pages[i].extract_text() or "" for i in indices]
+
+
+def iter_pdf_pages_parallel(data: bytes, pages: list, workers: int = None):
+    """Yield page texts in order, extracting batches of pages in worker processes."""
+    workers = workers or min(4, os.cpu_count() or 1)
+    batches = [pages[i:i + PAGE_BATCH] for i in range(0, len(pages), PAGE_BATCH)]
+    # "spawn" avoids forking the Streamlit server with its threads mid-flight.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(data,)) as pool:
+        in_flight = []
+        for batch in batches:
+            in_flight.append(pool.submit(_extract_batch, batch))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.pop(0).result()
+        for future in in_flight:
+            yield from future.result()
+
+
+def iter_text(data: bytes, name: str, page_spec: str = "", workers: int = None):
+    """Yield the text of a document piece by piece (one piece per PDF page)."""
+    name = name.lower()
+    if name.endswith(".txt"):
+        yield data.decode("utf-8", errors="ignore")
+    elif name.endswith(".pdf"):
+        reader = _pdf_reader(data)
+        pages = parse_page_range(page_spec, len(reader.pages))
+        if len(pages) >= PARALLEL_MIN_PAGES and workers != 1 and (os.cpu_count() or 1) > 1:
+            yield from iter_pdf_pages_parallel(data, pages, workers)
+        else:
+            yield from iter_pdf_pages(reader, pages)
+    elif name.endswith(".docx"):
+        import docx2txt
+
+        yield docx2txt.process(io.BytesIO(data)) or ""
+
+
+def extract_text(data: bytes, name: str, page_spec: str = "", max_chars: int = None, workers: int = None) -> str:
+    """Join the pieces from ``iter_text``, stopping early once ``max_chars`` is reached."""
+    with metrics.span("extract", kind=os.path.splitext(name)[1].lower().lstrip("."), bytes=len(data)) as span:
+        parts, size = [], 0
+        pieces = iter_text(data, name, page_spec, workers)
+        try:
+            for piece in pieces:
+                parts.append(piece)
+                size += len(piece) + 1
+                if max_chars and size >= max_chars:
+                    break
+        finally:
+            pieces.close()
+        text = "\n".join(parts)
+        text = text[:max_chars] if max_chars else text
+        span.set(chars=len(text))
+    return text
@@ -0,0 +1,290 @@
+"""Bounded, compact per-session history.
+
+Records use ``__slots__`` and keep their input and output zlib-compressed. The
+newest records stay in memory in a hot window capped both by count and by
+bytes; older ones live in a key-value store (see ``storage``). Without a store
+the spill goes to a per-session SQLite file in the temp directory that is
+deleted when the history is garbage collected; with a shared store and a
+per-user namespace every record is written through, so history survives
+restarts and is readable from any app process. History can be read page by
+page or iterated oldest-first without loading everything at once.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import deque
+
+from .parsers import RECORD_TYPES
+from .storage import KVStore, SQLiteKV
+
+
+def _pack(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _unpack(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class HistoryRecord:
+    """One history entry. Also readable like a dict (``rec["content"]``) for exporters.
+
+    ``items`` holds the parsed Quiz questions or Flashcards (see ``parsers``).
+    """
+
+    __slots__ = ("id", "type", "topic", "tag", "timestamp", "roadmap", "timing", "seq", "items", "_input", "_content")
+
+    def __init__(self, id, type, topic, tag, timestamp, input="", content="", roadmap=None, timing=None, seq=None,
+                 items=None):
+        self.id = id
+        self.type = type
+        self.topic = topic
+        self.tag = tag
+        self.timestamp = timestamp
+        self.roadmap = roadmap
+        self.timing = timing
+        self.seq = seq  # position in the history, set when appended
+        # Records come back from JSON as plain lists; rebuild the typed tuples.
+        self.items = [RECORD_TYPES[type][0](*row) for row in items] if items else None
+        self._input = _pack(input)
+        self._content = _pack(content)
+
+    @property
+    def input(self) -> str:
+        return _unpack(self._input)
+
+    @property
+    def content(self) -> str:
+        return _unpack(self._content)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def nbytes(self) -> int:
+        """Approximate heap size: compressed bodies plus the small text fields."""
+        items = sum(len(str(row)) + 64 for row in self.items) if self.items else 0
+        return len(self._input) + len(self._content) + len(self.topic) + len(self.tag) + items + 200
+
+    def dumps(self) -> bytes:
+        meta = {k: getattr(self, k) for k in ("id", "type", "topic", "tag", "timestamp", "roadmap", "timing", "seq", "items")}
+        header = json.dumps(meta).encode("utf-8")
+        return b"%d:%d:" % (len(header), len(self._input)) + header + self._input + self._content
+
+    @classmethod
+    def loads(cls, blob: bytes) -> "HistoryRecord":
+        header_len, input_len, rest = blob.split(b":", 2)
+        header_len, input_len = int(header_len), int(input_len)
+        record = cls(**json.loads(rest[:header_len]))
+        record._input = rest[header_len:header_len + input_len]
+        record._content = rest[header_len + input_len:]
+        return record
+
+
+class HistoryStore:
+    """Hot in-memory window of the newest records; older ones live in a KV store.
+
+    Pass ``kv`` and ``namespace`` (e.g. ``"user:<id>:"``) to persist every
+    record. Records are then keyed by a time-ordered stamp unique to this
+    store (nanoseconds plus a random writer id), so every tab and process
+    writing the same namespace appends without coordinating, and an append
+    only queues writes. The count is a counter in the store; bodies are read
+    only on demand.
+    """
+
+    def __init__(self, hot_size: int = 50, hot_bytes: int = 8 * 1024 * 1024, spill_dir: str = None,
+                 kv: KVStore = None, namespace: str = ""):
+        self.hot_size = hot_size
+        self.hot_bytes = hot_bytes
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "smart-study-history")
+        self.namespace = namespace
+        self._hot = deque()
+        self._hot_nbytes = 0
+        self._kv = kv
+        self._persistent = kv is not None
+        self._lock = threading.RLock()
+        self._count = 0  # without a store; with one, see ``__len__``
+        self._writer = uuid.uuid4().hex[:8]
+        self._last_ns = 0
+        if kv is not None and kv.get(self._count_key) is None:
+            # History written before the counter existed: count it once.
+            existing = kv.count(self._rec_prefix)
+            if existing:
+                kv.write(incrs={self._count_key: existing})
+
+    def __len__(self) -> int:
+        if self._persistent:
+            return int(self._kv.get(self._count_key) or 0)
+        return self._count
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def _rec_prefix(self) -> str:
+        return f"{self.namespace}rec:"
+
+    @property
+    def _count_key(self) -> str:
+        return f"{self.namespace}count"
+
+    def _rec_key(self, seq) -> str:
+        # Positions (int) without a store, stamps (str) with one; older
+        # persistent histories used zero-padded positions too.
+        return f"{self._rec_prefix}{seq:010d}" if isinstance(seq, int) else f"{self._rec_prefix}{seq}"
+
+    def _stamp(self) -> str:
+        # Strictly increasing within this store even if the clock stalls.
+        self._last_ns = max(time.time_ns(), self._last_ns + 1)
+        return f"{self._last_ns:020d}{self._writer}"
+
+    def _cold(self) -> KVStore:
+        if self._kv is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.sqlite")
+            self._kv = SQLiteKV(path)
+            weakref.finalize(self, _drop_spill_file, self._kv, path)
+        return self._kv
+
+    def _puts(self, records) -> dict:
+        puts = {}
+        for record in records:
+            puts[self._rec_key(record.seq)] = record.dumps()
+            puts[f"{self.namespace}id:{record.id}"] = str(record.seq).encode()
+        return puts
+
+    def append(self, record: HistoryRecord):
+        self.extend([record])
+
+    def extend(self, records):
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            for record in records:
+                if self._persistent:
+                    record.seq = self._stamp()
+                else:
+                    record.seq = self._count
+                    self._count += 1
+            spilled = []
+            for record in records:
+                self._hot.append(record)
+                self._hot_nbytes += record.nbytes()
+            while len(self._hot) > 1 and (len(self._hot) > self.hot_size or self._hot_nbytes > self.hot_bytes):
+                old = self._hot.popleft()
+                self._hot_nbytes -= old.nbytes()
+                spilled.append(old)
+            if self._persistent:
+                # Written through on append (queued, with a write-behind store);
+                # evicting from the window needs no I/O.
+                self._kv.write(self._puts(records), incrs={self._count_key: len(records)})
+            elif spilled:
+                self._cold().write(self._puts(spilled))
+
+    def save(self, record: HistoryRecord):
+        """Write back a record changed after it was appended (e.g. its roadmap)."""
+        with self._lock:
+            if self._persistent or record.seq < self._first_hot_seq():
+                self._cold().write(self._puts([record]))
+
+    def _first_hot_seq(self) -> int:
+        # Without a store this session is the only writer, so the window is contiguous.
+        return self._count - len(self._hot)
+
+    def get_range(self, start: int, stop: int) -> list:
+        """Records at positions [start, stop) (0 = oldest), oldest first."""
+        with self._lock:
+            start, stop = max(0, start), min(stop, len(self))
+            if start >= stop:
+                return []
+            if self._persistent:
+                return self._load(self._kv.scan(self._rec_prefix, limit=stop)[start:])
+            first_hot = self._first_hot_seq()
+            out = []
+            if start < first_hot and self._kv is not None:
+                rows = self._kv.scan(self._rec_prefix, f"{start:010d}", f"{min(stop, first_hot):010d}")
+                out.extend(HistoryRecord.loads(body) for _, body in rows)
+            for seq in range(max(start, first_hot), stop):
+                out.append(self._hot[seq - first_hot])
+            return out
+
+    def _load(self, rows) -> list:
+        """Records for ``(key, body)`` rows, taking the ones still in the window from memory."""
+        hot = {self._rec_key(record.seq): record for record in self._hot}
+        return [hot.get(key) or HistoryRecord.loads(body) for key, body in rows]
+
+    def recent(self, n: int) -> list:
+        """The newest ``n`` records, newest first."""
+        return self.page(0, n)
+
+    def page(self, number: int, size: int = 10) -> list:
+        """Page ``number`` (0 = newest) of ``size`` records, newest first."""
+        if self._persistent:
+            # Keys sort by time, so the newest pages are the first rows of a reverse scan.
+            with self._lock:
+                rows = self._kv.scan(self._rec_prefix, limit=(number + 1) * size, reverse=True)
+                return self._load(rows[number * size:])
+        stop = len(self) - number * size
+        return list(reversed(self.get_range(stop - size, stop)))
+
+    def page_count(self, size: int = 10) -> int:
+        return max(1, -(-len(self) // size))
+
+    def find(self, record_id):
+        with self._lock:
+            for record in reversed(self._hot):
+                if record.id == record_id:
+                    return record
+            if self._kv is not None:
+                seq = self._kv.get(f"{self.namespace}id:{record_id}")
+                if seq is not None:
+                    seq = seq.decode() if isinstance(seq, bytes) else str(seq)
+                    # Positions are at most 10 digits; stamps are longer.
+                    body = self._kv.get(self._rec_key(int(seq) if len(seq) <= 10 else seq))
+                    return HistoryRecord.loads(body) if body is not None else None
+        return None
+
+    def __iter__(self):
+        """Oldest to newest, in batches."""
+        if self._persistent:
+            return self._iter_keys()
+        return self._iter_range(0, len(self))
+
+    def _iter_range(self, start: int, stop: int, batch: int = 200):
+        for first in range(start, stop, batch):
+            yield from self.get_range(first, min(first + batch, stop))
+
+    def _iter_keys(self, batch: int = 200):
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._kv.scan(self._rec_prefix, after, limit=batch)
+                records = self._load(rows)
+            yield from records
+            if len(rows) < batch:
+                return
+            # The smallest suffix sorting after the last key read.
+            after = rows[-1][0][len(self._rec_prefix):] + "\0"
+
+    def memory_bytes(self) -> int:
+        return self._hot_nbytes
+
+
+def _drop_spill_file(kv, path):
+    kv.close()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
@@ -0,0 +1,189 @@
+"""Interchangeable chat backends behind ``actions.complete``.
+
+* ``OpenAIBackend`` - the real model, through the pooled ``LLMClient``.
+* ``StubBackend`` - deterministic local output with configurable latency and
+  token throughput, for load tests and benchmarks without network calls.
+* ``ReplayBackend`` / ``RecordingBackend`` - serve responses saved in a JSON
+  fixture file, or record live responses into one.
+
+Pick one with ``LLM_BACKEND`` (openai, stub, replay, record).
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from .llm_cache import make_key
+from .llm_client import LLMClient
+from .tokens import estimate_tokens
+
+
+class ChatBackend:
+    """Subclasses implement ``chat``, ``stream_chat`` or both."""
+
+    name = "base"
+    model = "unknown"
+
+    @property
+    def ready(self) -> bool:
+        return True
+
+    def chat(self, messages: list, max_tokens: int, temperature: float) -> str:
+        return "".join(self.stream_chat(messages, max_tokens, temperature)).strip()
+
+    def stream_chat(self, messages: list, max_tokens: int, temperature: float):
+        yield self.chat(messages, max_tokens, temperature)
+
+
+class OpenAIBackend(ChatBackend):
+    name = "openai"
+
+    def __init__(self, client: LLMClient):
+        self.client = client
+        self.model = client.model
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.client.api_key)
+
+    def chat(self, messages, max_tokens, temperature):
+        return self.client.chat(messages, max_tokens, temperature)
+
+    def stream_chat(self, messages, max_tokens, temperature):
+        return self.client.stream_chat(messages, max_tokens, temperature)
+
+
+class StubBackend(ChatBackend):
+    """Deterministic fake model: same prompt, same output, at a configurable speed.
+
+    ``latency`` is the delay before the first token and ``tokens_per_sec`` the
+    streaming rate (0 for instant). Output follows the shape the prompt asks for
+    (flashcards, quiz questions or bullet points) so every renderer is exercised.
+    """
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, latency: float = 0.0, tokens_per_sec: float = 0.0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+
+    def generate(self, messages: list, max_tokens: int) -> str:
+        prompt = messages[-1]["content"]
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        words = [w for w in (w.strip(".,;:()[]{}\"'") for w in prompt.split()) if len(w) > 3 and w.isalpha()]
+        words = words or ["concept"]
+
+        def phrase(n):
+            return " ".join(rng.choice(words) for _ in range(n))
+
+        # Quiz and Flashcard prompts ask for JSON in a shape that names its list.
+        if '"cards"' in prompt:
+            cards = [{"front": f"What is {phrase(3)}?", "back": f"{phrase(8).capitalize()}."} for _ in range(5)]
+            return json.dumps({"cards": cards}, indent=1)
+        if '"questions"' in prompt:
+            questions = [
+                {
+                    "question": f"Which statement about {phrase(2)} is correct?",
+                    "options": [phrase(4) for _ in range(4)],
+                    "answer": rng.choice("ABCD"),
+                    "explanation": f"{phrase(6).capitalize()}.",
+                }
+                for _ in range(3)
+            ]
+            return json.dumps({"questions": questions}, indent=1)
+        blocks = [f"- **{phrase(2).title()}**: {phrase(10)}." for _ in range(6)]
+        text = "\n\n".join(blocks)
+        # Respect the length budget the way a real model would (roughly).
+        limit = max_tokens * 4
+        return text if len(text) <= limit else text[:limit]
+
+    def stream_chat(self, messages, max_tokens, temperature):
+        text = self.generate(messages, max_tokens)
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.tokens_per_sec:
+            yield text
+            return
+        pieces = text.split(" ")
+        for i, piece in enumerate(pieces):
+            time.sleep(estimate_tokens(piece) / self.tokens_per_sec)
+            yield piece if i == len(pieces) - 1 else piece + " "
+
+
+class ReplayBackend(ChatBackend):
+    """Serve responses recorded in a fixture file; unknown prompts are an error."""
+
+    name = "replay"
+
+    def __init__(self, path: str, model: str = "gpt-3.5-turbo"):
+        self.path = path
+        self.model = model
+        self.responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.responses = json.load(f).get("responses", {})
+
+    def key(self, messages, max_tokens, temperature) -> str:
+        return make_key(self.model, messages, max_tokens=max_tokens, temperature=temperature)
+
+    def chat(self, messages, max_tokens, temperature):
+        key = self.key(messages, max_tokens, temperature)
+        if key not in self.responses:
+            raise LookupError(f"No recorded response for this prompt in {self.path}")
+        return self.responses[key]
+
+
+class RecordingBackend(ReplayBackend):
+    """Pass calls through to ``inner`` and save every response to the fixture file."""
+
+    name = "record"
+
+    def __init__(self, inner: ChatBackend, path: str):
+        super().__init__(path, inner.model)
+        self.inner = inner
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.inner.ready
+
+    def _save(self, key: str, text: str):
+        with self._lock:
+            self.responses[key] = text
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "responses": self.responses}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def chat(self, messages, max_tokens, temperature):
+        text = self.inner.chat(messages, max_tokens, temperature)
+        self._save(self.key(messages, max_tokens, temperature), text)
+        return text
+
+    def stream_chat(self, messages, max_tokens, temperature):
+        parts = []
+        for delta in self.inner.stream_chat(messages, max_tokens, temperature):
+            parts.append(delta)
+            yield delta
+        self._save(self.key(messages, max_tokens, temperature), "".join(parts).strip())
+
+
+def backend_from_env() -> ChatBackend:
+    kind = os.getenv("LLM_BACKEND", "openai").lower()
+    fixtures = os.getenv("LLM_FIXTURES", "llm_fixtures.json")
+    if kind == "stub":
+        return StubBackend(
+            latency=float(os.getenv("STUB_LATENCY", "0")),
+            tokens_per_sec=float(os.getenv("STUB_TOKENS_PER_SEC", "0")),
+        )
+    if kind == "replay":
+        return ReplayBackend(fixtures, os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"))
+    if kind == "record":
+        return RecordingBackend(OpenAIBackend(LLMClient.from_env()), fixtures)
+    if kind != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND {kind!r} (expected openai, stub, replay or record)")
+    return OpenAIBackend(LLMClient.from_env())
@@ -0,0 +1,131 @@
+"""Content-addressed cache for chat completions.
+
+Responses are keyed on a hash of the model, the messages and the sampling
+parameters, held in a bounded in-memory LRU and optionally mirrored to a
+SQLite file so they survive restarts and are shared by every session in the
+process.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(model: str, messages: list, **params) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU with optional per-entry TTL (in seconds)."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, stored_at: float = None):
+        with self._lock:
+            self._data[key] = (value, stored_at or time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """Two-tier response cache: in-memory LRU in front of an optional SQLite file."""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 24 * 3600, db_path: str = None):
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries, ttl)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count(hits=1)
+            return value
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row and (self.ttl is None or time.time() - row[1] <= self.ttl):
+                self.memory.set(key, row[0], stored_at=row[1])
+                self._count(hits=1, disk_hits=1)
+                return row[0]
+        self._count(misses=1)
+        return None
+
+    def _count(self, hits=0, disk_hits=0, misses=0):
+        with self._stats_lock:
+            self.hits += hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        self.memory.set(key, value, stored_at=now)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                self._db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
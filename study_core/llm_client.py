@@ -0,0 +1,203 @@
+"""Process-wide chat client: pooled connections, timeouts, retries and rate limits.
+
+Wraps the ``openai`` 0.28 API with per-request credentials instead of the
+module globals, so the same object can be pointed at a local stub server
+(``api_base="http://127.0.0.1:8000/v1"``) in tests and benchmarks;
+``benchmarks/check_llm_client.py`` checks the retries that way.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .tokens import estimate_tokens
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+
+
+class TokenBucket:
+    """Blocking token bucket refilled continuously at ``per_minute`` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        # A single request larger than the bucket would wait forever; let it drain the bucket.
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, (openai.error.Timeout, openai.error.APIConnectionError,
+                          openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                          openai.error.TryAgain)):
+        return True
+    status = getattr(error, "http_status", None)
+    return status in RETRYABLE_STATUS
+
+
+def retry_after(error: Exception):
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class SharedSession(requests.Session):
+    """A ``requests.Session`` that only ``shutdown`` closes.
+
+    openai 0.28 calls ``close()`` on each thread's session once it is
+    ``MAX_SESSION_LIFETIME_SECS`` old. Here every thread's session is this
+    one process-wide pool, so that would drop everyone's keep-alive
+    connections every few minutes.
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class LLMClient:
+    """Chat completions with keep-alive pooling, backoff with jitter and RPM/TPM limits."""
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str = None,
+        model: str = "gpt-3.5-turbo",
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        rpm: float = None,
+        tpm: float = None,
+        pool_size: int = 16,
+    ):
+        self.api_key = api_key
+        self.api_base = api_base or DEFAULT_API_BASE
+        self.model = model
+        self.timeout = (connect_timeout, timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_limit = TokenBucket(rpm) if rpm else None
+        self.token_limit = TokenBucket(tpm) if tpm else None
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._installed = False
+
+        self.session = SharedSession()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        def number(name, default=None):
+            value = os.getenv(name)
+            return float(value) if value else default
+
+        return cls(
+            api_key=os.getenv("OPENAI_API_KEY", ""),
+            api_base=os.getenv("OPENAI_API_BASE") or None,
+            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+            timeout=number("LLM_TIMEOUT", 60.0),
+            max_retries=int(number("LLM_MAX_RETRIES", 4)),
+            rpm=number("LLM_RPM"),
+            tpm=number("LLM_TPM"),
+            pool_size=int(number("LLM_POOL_SIZE", 16)),
+        )
+
+    def _throttle(self, messages: list, max_tokens: int):
+        if self.request_limit:
+            self.request_limit.acquire(1)
+        if self.token_limit:
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            self.token_limit.acquire(prompt_tokens + max_tokens)
+
+    def _backoff(self, attempt: int, error: Exception):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        hinted = retry_after(error)
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.backoff_max))
+        with self._lock:
+            self.retries += 1
+        metrics.add("retries")
+        metrics.inc("study_llm_retries_total")
+        time.sleep(delay)
+
+    def _create(self, messages: list, max_tokens: int, temperature: float, stream: bool):
+        # Imported on the first request: openai and the aiohttp stack behind it
+        # take longer to load than the rest of the app's modules together.
+        import openai
+
+        if not self._installed:
+            # openai 0.28 gives every thread the Session instance set here, which
+            # gives all sessions of the app one keep-alive connection pool. Set
+            # once, on first use, so importing openai stays off the cold start.
+            openai.requestssession = self.session
+            self._installed = True
+        self._throttle(messages, max_tokens)
+        return openai.ChatCompletion.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream,
+            api_key=self.api_key,
+            api_base=self.api_base,
+            request_timeout=self.timeout,
+        )
+
+    def chat(self, messages: list, max_tokens: int, temperature: float) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self._create(messages, max_tokens, temperature, stream=False)
+                return resp["choices"][0]["message"]["content"].strip()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self._backoff(attempt, e)
+
+    def stream_chat(self, messages: list, max_tokens: int, temperature: float):
+        """Yield content deltas. Retries only happen before the first delta arrives."""
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                for chunk in self._create(messages, max_tokens, temperature, stream=True):
+                    delta = chunk["choices"][0]["delta"].get("content")
+                    if delta:
+                        started = True
+                        yield delta
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self._backoff(attempt, e)
+
+    def close(self):
+        self.session.shutdown()
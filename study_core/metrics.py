@@ -0,0 +1,266 @@
+"""Timing spans and counters, exported as Prometheus text and JSON log lines.
+
+``with span("extract", kind="pdf") as s:`` times a block; ``s.set(...)`` and
+``add(...)`` attach fields to it from anywhere below it on the same thread or
+context. Every finished span feeds the process-wide ``REGISTRY`` (served on
+``/metrics`` by ``start_server``), the session's ``SessionMetrics`` if one is
+active (``use_session``), and one JSON line on the ``study_core.metrics``
+logger when that logger is enabled (``configure_logging``).
+
+The active session and span travel in context variables. Worker threads
+start with an empty context, so code that hands work to a pool goes through
+``submit`` to keep attributing it to the caller's session.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_session = contextvars.ContextVar("metrics_session", default=None)
+_span = contextvars.ContextVar("metrics_span", default=None)
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, text: str):
+        self.help[name] = (kind, text)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum of the values.
+                counts = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            counts[slot] += 1
+            counts[-1] += value
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(counts)) for key, counts in self.histograms.items())
+        lines, described = [], set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self.help.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), counts in histograms:
+            header(name, "histogram")
+            running = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), counts):
+                running += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {running}")
+            lines.append(f"{name}_sum{_labels(labels)} {counts[-1]:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {running}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value) -> str:
+    # Exact: ``:g`` would round large counters to six significant digits.
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+REGISTRY.describe("study_span_seconds", "histogram", "Time spent in instrumented spans.")
+REGISTRY.describe("study_span_errors_total", "counter", "Spans that ended with an error.")
+REGISTRY.describe("study_llm_calls_total", "counter", "Model calls by backend and response-cache result.")
+REGISTRY.describe("study_llm_tokens_total", "counter", "Estimated prompt and completion tokens sent and received.")
+REGISTRY.describe("study_llm_ttft_seconds", "histogram", "Time to the first streamed token.")
+REGISTRY.describe("study_llm_retries_total", "counter", "Model requests retried after a transient error.")
+
+
+class SessionMetrics:
+    """Per-session totals of every span name and numeric field, for the performance panel."""
+
+    def __init__(self, session_id: str = ""):
+        self.session_id = session_id
+        self.spans = {}  # name -> [count, total seconds, slowest, last]
+        self.fields = {}  # (span name, field) -> [count, total]
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, fields: dict):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = [0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] = seconds
+            for field, value in fields.items():
+                if field == "error":
+                    field, value = "errors", 1
+                if isinstance(value, (int, float)):
+                    totals = self.fields.setdefault((name, field), [0, 0])
+                    totals[0] += 1
+                    totals[1] += value
+
+    def snapshot(self) -> dict:
+        """``{"spans": {name: (count, total, slowest, last)}, "fields": {(name, field): (count, total)}}``."""
+        with self._lock:
+            return {
+                "spans": {name: tuple(stats) for name, stats in self.spans.items()},
+                "fields": {key: tuple(totals) for key, totals in self.fields.items()},
+            }
+
+
+class Span:
+    __slots__ = ("name", "fields", "started", "_token")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+        return self
+
+    def __enter__(self):
+        self._token = _span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        try:
+            _span.reset(self._token)
+        except ValueError:
+            # Closed from another context (a generator finished elsewhere).
+            pass
+        if exc_type is not None and "error" not in self.fields:
+            self.fields["error"] = exc_type.__name__
+        finish(self.name, seconds, self.fields)
+        return False
+
+
+def span(name: str, **fields) -> Span:
+    return Span(name, fields)
+
+
+def finish(name: str, seconds: float, fields: dict):
+    """Record a span measured elsewhere (e.g. across a script run)."""
+    REGISTRY.observe("study_span_seconds", seconds, span=name)
+    if "error" in fields:
+        REGISTRY.inc("study_span_errors_total", span=name)
+    session = _session.get()
+    if session is not None:
+        session.record(name, seconds, fields)
+    if log.isEnabledFor(logging.INFO):
+        record = {"ts": round(time.time(), 3), "span": name, "seconds": round(seconds, 6), **fields}
+        if session is not None and session.session_id:
+            record["session"] = session.session_id
+        log.info(json.dumps(record, default=str))
+
+
+def add(field: str, amount: float = 1):
+    """Add to a numeric field of the innermost active span, if there is one."""
+    current = _span.get()
+    if current is not None:
+        current.fields[field] = current.fields.get(field, 0) + amount
+
+
+def inc(name: str, amount: float = 1, **labels):
+    REGISTRY.inc(name, amount, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def use_session(session: SessionMetrics):
+    """Attribute spans in the current context to ``session`` (``None`` for none)."""
+    _session.set(session)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """``pool.submit`` that runs ``fn`` in a copy of the caller's context (one copy per task)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def configure_logging(target: str):
+    """Write one JSON line per span to stderr (``"-"``) or to the file ``target``."""
+    if not target or log.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if target == "-" else logging.FileHandler(target, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def start_server(port: int, host: str = "127.0.0.1"):
+    """Serve ``/metrics`` from a daemon thread; raises OSError if the port is taken."""
+    # Imported here: only processes that serve the endpoint pay for http.server.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_from_env():
+    """Set up logging and the endpoint from ``METRICS_LOG`` / ``METRICS_PORT``; returns the server or ``None``."""
+    configure_logging(os.getenv("METRICS_LOG", ""))
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return start_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+    except OSError as e:
+        # Another app process on this host already serves the port.
+        logging.getLogger(__package__).warning("metrics endpoint not started on port %s: %s", port, e)
+        return None
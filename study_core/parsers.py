@@ -0,0 +1,156 @@
+"""Structured Quiz and Flashcard output.
+
+The prompts ask for JSON; ``parse_records`` validates a reply once and turns
+it into compact typed records, which is what gets stored and rendered.
+``JSONItemReader`` pulls finished items out of a reply while it is still
+streaming. The plain-text parsers read the older ``Answer:`` and
+``FRONT:``/``BACK:`` formats, for history saved before the switch to JSON and
+for replies that ignore the format.
+"""
+import json
+import re
+from collections import namedtuple
+
+QuizQuestion = namedtuple("QuizQuestion", ["question", "options", "answer", "explanation"])
+Flashcard = namedtuple("Flashcard", ["front", "back"])
+
+# action -> (record type, key of the item list in the JSON reply)
+RECORD_TYPES = {"Quiz": (QuizQuestion, "questions"), "Flashcard": (Flashcard, "cards")}
+
+LETTERS = "ABCD"
+_OPTION_PREFIX_RE = re.compile(r"^\s*[A-Da-d]\s*[).:-]\s*")
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def quiz_record(item) -> QuizQuestion:
+    """Validate one quiz item; raises ValueError saying what is wrong."""
+    if not isinstance(item, dict):
+        raise ValueError("each question must be an object")
+    question = str(item.get("question") or "").strip()
+    options = item.get("options")
+    answer = str(item.get("answer") or "").strip().upper()[:1]
+    if not question:
+        raise ValueError('"question" is missing or empty')
+    if not isinstance(options, list) or not 2 <= len(options) <= 4:
+        raise ValueError('"options" must be a list of 2 to 4 strings')
+    options = tuple(_OPTION_PREFIX_RE.sub("", str(o)).strip() for o in options)
+    if answer not in LETTERS[:len(options)]:
+        raise ValueError(f'"answer" must be one of {", ".join(LETTERS[:len(options)])}')
+    return QuizQuestion(question, options, answer, str(item.get("explanation") or "").strip())
+
+
+def flashcard_record(item) -> Flashcard:
+    if not isinstance(item, dict):
+        raise ValueError("each card must be an object")
+    front = str(item.get("front") or "").strip()
+    back = str(item.get("back") or "").strip()
+    if not front or not back:
+        raise ValueError('every card needs a non-empty "front" and "back"')
+    return Flashcard(front, back)
+
+
+VALIDATORS = {"Quiz": quiz_record, "Flashcard": flashcard_record}
+
+
+def parse_records(action: str, text: str):
+    """Validate a JSON reply; returns ``(records, None)`` or ``(None, error message)``."""
+    _, key = RECORD_TYPES[action]
+    try:
+        data = json.loads(_FENCE_RE.sub("", text))
+    except ValueError as e:
+        return None, f"not valid JSON ({e})"
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, f'expected an object with a non-empty "{key}" list'
+    records = []
+    for n, item in enumerate(items, start=1):
+        try:
+            records.append(VALIDATORS[action](item))
+        except ValueError as e:
+            return None, f"{key}[{n}]: {e}"
+    return records, None
+
+
+def format_records(action: str, records: list) -> str:
+    """Plain-text form of the records, for exports and the study-path prompt."""
+    if action == "Quiz":
+        blocks = []
+        for n, q in enumerate(records, start=1):
+            lines = [f"Q{n}. {q.question}"]
+            lines += [f"{LETTERS[i]}) {option}" for i, option in enumerate(q.options)]
+            lines.append(f"Answer: {q.answer}")
+            if q.explanation:
+                lines.append(f"Why: {q.explanation}")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+    return "\n".join(f"FRONT: {card.front}\nBACK: {card.back}" for card in records)
+
+
+def records_from_text(action: str, text: str) -> list:
+    """Best-effort records from the older plain-text formats (may be empty)."""
+    if action == "Flashcard":
+        return [Flashcard(front or "", back or "") for front, back in parse_flashcards(text) if front and back]
+    records = []
+    for block in quiz_blocks(text):
+        if "Answer:" in block:
+            question, answer = block.rsplit("Answer:", 1)
+            records.append(QuizQuestion(question.strip(), (), answer.strip(), ""))
+    return records
+
+
+class JSONItemReader:
+    """Yield the items of the first JSON array in a growing text as each one completes."""
+
+    def __init__(self):
+        self.text = ""
+        self.pos = None
+        self.done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        if self.done:
+            return []
+        if self.pos is None:
+            start = self.text.find("[")
+            if start < 0:
+                return []
+            self.pos = start + 1
+        items = []
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n,":
+                self.pos += 1
+            if self.pos >= len(self.text):
+                break
+            if self.text[self.pos] == "]":
+                self.done = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self.text, self.pos)
+            except ValueError:
+                break  # the item is not complete yet
+            items.append(item)
+            self.pos = end
+        return items
+
+
+def quiz_blocks(output_text: str) -> list:
+    return [b.strip() for b in output_text.split("\n\n") if b.strip()]
+
+
+def parse_flashcards(output_text: str) -> list:
+    """Return ``(front, back)`` pairs from ``FRONT: ...`` / ``BACK: ...`` lines."""
+    lines = [l for l in output_text.splitlines() if l.strip()]
+    cards = []
+    front, back = None, None
+    for line in lines:
+        if line.startswith("FRONT:"):
+            if front or back:
+                cards.append((front, back))
+            front = line.replace("FRONT:", "").strip()
+            back = None
+        elif line.startswith("BACK:"):
+            back = line.replace("BACK:", "").strip()
+    if front or back:
+        cards.append((front, back))
+    return cards
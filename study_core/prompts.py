@@ -0,0 +1,71 @@
+"""Prompt templates, built once per process and shared by every session.
+
+Everything here is a module-level constant or a pure function of its
+arguments, so nothing is rebuilt on a Streamlit rerun.
+"""
+
+SYSTEM_PROMPT = "You are an expert study assistant. Be clear, structured, and learner-friendly."
+
+LEVEL_HINTS = {
+    "Beginner": "Explain as if to a complete beginner. ",
+    "High School": "Aim at an advanced high-school student. ",
+    "University": "Aim at a typical university student. ",
+    "Advanced": "Aim at an advanced learner; keep it rigorous. ",
+}
+
+STYLE_HINTS = {
+    "Short & Direct": "Keep it concise and direct. ",
+    "Step-by-Step": "Use a clear step-by-step structure with numbered steps. ",
+    "With Examples": "Include simple, concrete examples. ",
+    "With Analogies": "Use analogies and intuitive explanations. ",
+}
+
+JSON_SHAPES = {
+    "Quiz": '{"questions": [{"question": "...", "options": ["...", "...", "...", "..."], "answer": "A", "explanation": "..."}]}',
+    "Flashcard": '{"cards": [{"front": "...", "back": "..."}]}',
+}
+
+BASE_PROMPTS = {
+    "Summarize": (
+        "Summarize the following in 5-8 bullet points. Highlight key concepts, formulas, and definitions. "
+    ),
+    "Explain": (
+        "Explain the following clearly using headings and short paragraphs. "
+    ),
+    "Quiz": (
+        "Create 3 multiple-choice questions (A–D) from this content. "
+        "Reply with JSON only, in exactly this shape: " + JSON_SHAPES["Quiz"] + " "
+        "where \"answer\" is the letter of the correct option. "
+    ),
+    "Flashcard": (
+        "Create 5 flashcards from this content. "
+        "Reply with JSON only, in exactly this shape: " + JSON_SHAPES["Flashcard"] + " "
+    ),
+}
+
+REPAIR_PROMPT = (
+    "The reply below should be JSON in exactly this shape: {shape}\n"
+    "It is not valid: {error}. Return only the corrected JSON, keeping its content.\n\n{reply}"
+)
+
+ROADMAP_PROMPT = (
+    "Based on this topic/content, suggest a focused 5-step study roadmap "
+    "to fully understand and master it. Be concrete but concise:\n\n"
+)
+
+
+def chat_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def build_prompt(action: str, text: str, difficulty: str, style: str) -> str:
+    prefix = BASE_PROMPTS.get(action, "")
+    meta = LEVEL_HINTS.get(difficulty, "") + STYLE_HINTS.get(style, "")
+    return prefix + meta + "\n\n" + text
+
+
+def build_roadmap_prompt(text: str) -> str:
+    return ROADMAP_PROMPT + text
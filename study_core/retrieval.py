@@ -0,0 +1,73 @@
+"""Offline BM25 retrieval over the passages of one document.
+
+The document is cut into passages with ``tokens.chunk_text`` and indexed once
+(an inverted index of term -> (passage, count)); a query then only touches
+the postings of its own terms. No network and no dependencies beyond the
+standard library.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from .tokens import chunk_text
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were "
+    "what when where which who why how with about into than then there these those their they you your".split()
+)
+
+
+def _stem(term: str) -> str:
+    # Just enough to match "networks" with "network" and "queries" with "query".
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def terms(text: str) -> list:
+    return [_stem(t) for t in _TERM_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, passages: list, k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        postings = defaultdict(list)
+        lengths = []
+        for index, passage in enumerate(passages):
+            counts = Counter(terms(passage))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings[term].append((index, count))
+        count = len(passages)
+        average = (sum(lengths) / count) if count else 1
+        self.postings = dict(postings)
+        self.idf = {
+            term: math.log(1 + (count - len(hits) + 0.5) / (len(hits) + 0.5))
+            for term, hits in self.postings.items()
+        }
+        # Per-passage length normalisation, precomputed once.
+        self.norms = [k1 * (1 - b + b * length / (average or 1)) for length in lengths]
+
+    @classmethod
+    def from_text(cls, text: str, passage_tokens: int = 300) -> "BM25Index":
+        return cls(chunk_text(text, passage_tokens))
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Up to ``k`` ``(passage index, score)`` pairs, best first."""
+        scores = defaultdict(float)
+        for term in set(terms(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                scores[index] += idf * tf * (self.k1 + 1) / (tf + self.norms[index])
+        return heapq.nlargest(k, scores.items(), key=lambda hit: hit[1])
+
+    def top_passages(self, query: str, k: int = 5) -> list:
+        """The ``k`` best passages for ``query``, in document order (empty if nothing matches)."""
+        return [self.passages[index] for index in sorted(index for index, _ in self.search(query, k))]
@@ -0,0 +1,124 @@
+"""Spaced-repetition flashcard deck with an SM-2 scheduler.
+
+Cards live in a ``storage.KVStore``. Next to each card the deck keeps a
+due-index key ``due:<due time>:<card id>``; keys are ordered, so "what is due
+now" is one range scan on the store's index (O(log n) plus the cards
+returned) instead of a pass over the whole deck. Reviews move a card's index
+key; nothing else is rewritten.
+"""
+import hashlib
+import json
+import re
+import time
+from collections import namedtuple
+
+Card = namedtuple("Card", ["id", "front", "back", "ease", "interval", "reps", "lapses", "due", "source"])
+
+DAY = 86400
+RELEARN_DELAY = 600  # a failed card comes back after ten minutes
+MIN_EASE = 1.3
+# Button label -> SM-2 quality (0-5).
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+
+def card_id(front: str, back: str) -> str:
+    # The same card generated twice gets the same id, so it is only added once.
+    normalized = re.sub(r"\s+", " ", f"{front}\x1f{back}".lower()).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def schedule(card: Card, quality: int, now: float) -> Card:
+    """SM-2: the next interval grows by the ease factor; a failed card is relearned."""
+    ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return card._replace(ease=ease, interval=0, reps=0, lapses=card.lapses + 1, due=int(now) + RELEARN_DELAY)
+    reps = card.reps + 1
+    if reps == 1:
+        interval = 1
+    elif reps == 2:
+        interval = 6
+    else:
+        interval = max(card.interval + 1, round(card.interval * ease))
+    return card._replace(ease=ease, interval=interval, reps=reps, due=int(now) + interval * DAY)
+
+
+class Deck:
+    """Cards in ``kv`` under ``namespace``; ``dedup`` (a ``NearDuplicateIndex``) also skips near-duplicates."""
+
+    def __init__(self, kv, namespace: str = "", dedup=None):
+        self.kv = kv
+        self.namespace = namespace
+        self.dedup = dedup
+        if kv.get(self._count_key) is None:
+            # Deck written before the counter existed: count its cards once.
+            existing = kv.count(f"{namespace}card:")
+            if existing:
+                kv.incr(self._count_key, existing)
+
+    @property
+    def _count_key(self) -> str:
+        return f"{self.namespace}cards"
+
+    def _card_key(self, cid: str) -> str:
+        return f"{self.namespace}card:{cid}"
+
+    def _due_key(self, card: Card) -> str:
+        return f"{self.namespace}due:{card.due:011d}:{card.id}"
+
+    def __len__(self) -> int:
+        # A counter kept by ``add_many``: the review tab asks on every rerun.
+        return int(self.kv.get(self._count_key) or 0)
+
+    def get(self, cid: str):
+        body = self.kv.get(self._card_key(cid))
+        return Card(*json.loads(body)) if body is not None else None
+
+    def add_many(self, cards, source: str = None, now: float = None) -> int:
+        """Add ``(front, back)`` pairs as new cards due now; returns how many were new."""
+        now = int(time.time() if now is None else now)
+        puts, added = {}, 0
+        for front, back in cards:
+            cid = card_id(front, back)
+            if self._card_key(cid) in puts or self.kv.get(self._card_key(cid)) is not None:
+                continue
+            card = Card(cid, front, back, 2.5, 0, 0, 0, now, source)
+            card_puts = {self._card_key(cid): json.dumps(card).encode("utf-8"), self._due_key(card): b""}
+            if self.dedup is None:
+                puts.update(card_puts)
+            else:
+                signature = self.dedup.signature(f"{front} {back}")
+                if self.dedup.find(f"{front} {back}", signature) is not None:
+                    continue
+                card_puts.update(self.dedup.entries(cid, signature))
+                # Written per card so later cards in the same batch are checked against it.
+                self.kv.write(card_puts, incrs={self._count_key: 1})
+            added += 1
+        if puts:
+            self.kv.write(puts, incrs={self._count_key: added})
+        return added
+
+    def due(self, now: float = None, limit: int = 20) -> list:
+        """Up to ``limit`` cards due at ``now``, most overdue first."""
+        now = int(time.time() if now is None else now)
+        prefix = f"{self.namespace}due:"
+        rows = self.kv.scan(prefix, stop=f"{now + 1:011d}", limit=limit)
+        cards = []
+        for key, _ in rows:
+            card = self.get(key.rsplit(":", 1)[1])
+            if card is not None:
+                cards.append(card)
+        return cards
+
+    def next_due(self):
+        """Due time of the earliest card, or ``None`` for an empty deck."""
+        rows = self.kv.scan(f"{self.namespace}due:", limit=1)
+        return int(rows[0][0][len(self.namespace) + 4:].split(":")[0]) if rows else None
+
+    def review(self, card: Card, quality: int, now: float = None) -> Card:
+        now = time.time() if now is None else now
+        updated = schedule(card, quality, now)
+        self.kv.write(
+            puts={self._card_key(card.id): json.dumps(updated).encode("utf-8"), self._due_key(updated): b""},
+            deletes=[self._due_key(card)] if self._due_key(card) != self._due_key(updated) else None,
+        )
+        return updated
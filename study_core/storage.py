@@ -0,0 +1,241 @@
+"""Key-value storage for state that outlives a browser session.
+
+``KVStore`` is the small interface the app needs: point reads, ordered prefix
+scans, counters (batched, or atomic with ``incr``) and batched writes. ``SQLiteKV`` is the default: one file in
+WAL mode, so several app processes on the same host (or on a shared volume)
+can use it at once. Another backend only has to implement the same methods.
+``WriteBehind`` wraps any store, queues writes and applies them in batches on
+a background thread so a click never waits on disk; reads are answered from
+the queue on top of the inner store.
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class KVStore:
+    """Byte values under string keys, plus integer counters."""
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def scan(self, prefix: str, start: str = "", stop: str = None, limit: int = None, reverse: bool = False) -> list:
+        """``(key, value)`` pairs whose key is ``prefix + s`` with ``start <= s < stop``, in key order."""
+        raise NotImplementedError
+
+    def count(self, prefix: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        """Add ``delta`` to a counter right away and return its new value (atomic across processes)."""
+        raise NotImplementedError
+
+    def write(self, puts: dict = None, incrs: dict = None, deletes=None):
+        """Apply ``puts`` (key -> bytes), ``incrs`` (key -> int delta) and ``deletes`` (keys) as one batch."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _prefix_end(prefix: str) -> str:
+    # Smallest string greater than every key starting with ``prefix``.
+    return prefix + "\U0010ffff"
+
+
+class SQLiteKV(KVStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def scan(self, prefix: str, start: str = "", stop: str = None, limit: int = None, reverse: bool = False) -> list:
+        low = prefix + start
+        high = prefix + stop if stop is not None else _prefix_end(prefix)
+        order = "DESC" if reverse else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value FROM kv WHERE key >= ? AND key < ? ORDER BY key {order} LIMIT ?",
+                (low, high, -1 if limit is None else limit),
+            )
+            return rows.fetchall()
+
+    def count(self, prefix: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM kv WHERE key >= ? AND key < ?", (prefix, _prefix_end(prefix))
+            ).fetchone()
+        return row[0]
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        # UPSERT then SELECT in one transaction: RETURNING needs SQLite 3.35.
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                (key, delta),
+            )
+            row = self._db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0]
+
+    def write(self, puts: dict = None, incrs: dict = None, deletes=None):
+        with self._lock, self._db:
+            if deletes:
+                self._db.executemany("DELETE FROM kv WHERE key = ?", ((key,) for key in deletes))
+            if puts:
+                self._db.executemany("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", puts.items())
+            if incrs:
+                self._db.executemany(
+                    "INSERT INTO kv (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                    incrs.items(),
+                )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class WriteBehind(KVStore):
+    """Queue writes in memory and flush them to ``inner`` in batches.
+
+    Puts to the same key collapse to the last one (a delete cancels a queued
+    put and vice versa) and counter deltas are summed, so a burst of clicks
+    costs one transaction. Reads apply the queued writes to what ``inner``
+    returns, so a process sees its own writes without flushing them itself;
+    a read only waits if the background thread is in the middle of a flush.
+    """
+
+    def __init__(self, inner: KVStore, interval: float = 0.5, max_batch: int = 500):
+        self.inner = inner
+        self.interval = interval
+        self.max_batch = max_batch
+        self._puts, self._incrs, self._deletes = {}, {}, set()
+        self._pending = threading.Condition()
+        self._flushing = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="kv-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, puts: dict = None, incrs: dict = None, deletes=None):
+        with self._pending:
+            for key in deletes or ():
+                self._puts.pop(key, None)
+                self._deletes.add(key)
+            if puts:
+                self._deletes.difference_update(puts)
+                self._puts.update(puts)
+            for key, delta in (incrs or {}).items():
+                self._incrs[key] = self._incrs.get(key, 0) + delta
+            if len(self._puts) + len(self._incrs) + len(self._deletes) >= self.max_batch:
+                self._pending.notify()
+
+    def flush(self):
+        with self._flushing:
+            with self._pending:
+                puts, incrs, deletes = self._puts, self._incrs, self._deletes
+                self._puts, self._incrs, self._deletes = {}, {}, set()
+            if not puts and not incrs and not deletes:
+                return
+            try:
+                self.inner.write(puts, incrs, deletes)
+            except Exception:
+                # Keep the batch (newer writes win) and try again on the next tick.
+                with self._pending:
+                    self._deletes = (deletes - set(self._puts)) | self._deletes
+                    self._puts = {k: v for k, v in puts.items() if k not in self._deletes} | self._puts
+                    for key, delta in incrs.items():
+                        self._incrs[key] = self._incrs.get(key, 0) + delta
+                raise
+
+    def _run(self):
+        while True:
+            with self._pending:
+                self._pending.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                log.exception("write-behind flush failed; retrying")
+                time.sleep(self.interval)
+
+    # Reads hold ``_flushing`` so a batch is either still queued or already in
+    # ``inner``, never half-way (a counter delta would be counted twice).
+
+    def get(self, key: str):
+        with self._flushing:
+            with self._pending:
+                if key in self._deletes:
+                    return None
+                if key in self._puts:
+                    return self._puts[key]
+                delta = self._incrs.get(key)
+            value = self.inner.get(key)
+        return value if delta is None else (value or 0) + delta
+
+    def scan(self, prefix: str, start: str = "", stop: str = None, limit: int = None, reverse: bool = False) -> list:
+        low = prefix + start
+        high = prefix + stop if stop is not None else _prefix_end(prefix)
+        with self._flushing:
+            with self._pending:
+                puts = {k: v for k, v in self._puts.items() if low <= k < high}
+                incrs = {k: d for k, d in self._incrs.items() if low <= k < high}
+                deletes = {k for k in self._deletes if low <= k < high}
+            if not puts and not incrs and not deletes:
+                return self.inner.scan(prefix, start, stop, limit, reverse)
+            # Ask for enough rows that the queued deletes cannot leave the page short.
+            rows = dict(self.inner.scan(prefix, start, stop, None if limit is None else limit + len(deletes), reverse))
+        for key in deletes:
+            rows.pop(key, None)
+        rows.update(puts)
+        for key, delta in incrs.items():
+            rows[key] = (rows.get(key) or 0) + delta
+        # At least ``limit`` fetched rows survive the deletes, and every row not
+        # fetched sorts after them, so the first ``limit`` merged keys are right.
+        keys = sorted(rows, reverse=reverse)[:limit]
+        return [(key, rows[key]) for key in keys]
+
+    def count(self, prefix: str) -> int:
+        high = _prefix_end(prefix)
+        with self._flushing:
+            with self._pending:
+                added = {k for k in (*self._puts, *self._incrs) if prefix <= k < high}
+                removed = {k for k in self._deletes if prefix <= k < high}
+            total = self.inner.count(prefix)
+            # Only queued keys can change the count; check which of them ``inner`` already has.
+            total += sum(self.inner.get(k) is None for k in added)
+            total -= sum(self.inner.get(k) is not None for k in removed)
+        return total
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        """Applied to ``inner`` at once (not queued): the new value must be the same in every process."""
+        with self._flushing:
+            value = self.inner.incr(key, delta)
+            with self._pending:
+                return value + self._incrs.get(key, 0)
+
+    def close(self):
+        with self._pending:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        self._thread.join()
+        self.flush()
+        self.inner.close()
+
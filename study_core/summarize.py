@@ -0,0 +1,84 @@
+"""Map-reduce summarization for inputs too large for a single prompt.
+
+The map step summarizes token-bounded chunks concurrently; the reduce step
+merges the partial summaries (in rounds, if they still do not fit). Chunk
+prompts are deterministic, so with a response cache in front of the model a
+retry only pays for the chunks that failed last time.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import metrics
+from .tokens import chunk_text, estimate_tokens
+
+MAP_PROMPT = (
+    "Summarize this section of a larger document (part {index} of {total}) in concise "
+    "bullet points. Keep key concepts, formulas, and definitions:\n\n"
+)
+MAX_MERGE_ROUNDS = 3
+MERGE_PROMPT = (
+    "Merge these partial summaries of consecutive sections into one set of concise "
+    "bullet points, removing repetition:\n\n"
+)
+
+
+def is_error(result: str) -> bool:
+    return result.startswith("❌")
+
+
+def map_chunks(chunks, complete, concurrency: int = 4, on_progress=None, prompt=MAP_PROMPT) -> list:
+    """Summarize every chunk concurrently; failed chunks are left as error strings.
+
+    ``complete`` takes a prompt and returns text (or an "❌ Error: ..." string) and
+    must be thread-safe. ``on_progress(done, total, index, ok)`` is called from the
+    calling thread as each chunk finishes, so it may safely update the UI.
+    """
+    total = len(chunks)
+    results = [None] * total
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            metrics.submit(pool, complete, prompt.format(index=i + 1, total=total) + chunk): i
+            for i, chunk in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = f"❌ Error: {e}"
+            if on_progress:
+                on_progress(done, total, i, not is_error(results[i]))
+    return results
+
+
+def map_reduce_summarize(
+    text: str,
+    complete,
+    chunk_tokens: int = 2500,
+    concurrency: int = 4,
+    on_progress=None,
+    merged_tokens: int = None,
+):
+    """Return ``(merged partial summaries, None)`` on success or ``(None, error)`` if chunks failed.
+
+    Partials are merged in further rounds until they fit in ``merged_tokens``
+    (default ``chunk_tokens``), the room the caller has for them. The final
+    reduce step is left to the caller, which fits the partials into its prompt
+    (they can still be too long after ``MAX_MERGE_ROUNDS``) and can stream the
+    reply.
+    """
+    limit = merged_tokens or chunk_tokens
+    partials = map_chunks(chunk_text(text, chunk_tokens), complete, concurrency, on_progress)
+    for round_no in range(MAX_MERGE_ROUNDS + 1):
+        failed = [i + 1 for i, r in enumerate(partials) if is_error(r)]
+        if failed:
+            return None, (
+                f"❌ Error: {len(failed)} of {len(partials)} sections failed "
+                f"(parts {', '.join(map(str, failed[:10]))}{'...' if len(failed) > 10 else ''}). "
+                "Try again: finished sections are cached and will not be redone."
+            )
+        merged = "\n\n".join(partials)
+        if estimate_tokens(merged) <= limit or len(partials) == 1 or round_no == MAX_MERGE_ROUNDS:
+            return merged, None
+        partials = map_chunks(
+            chunk_text(merged, chunk_tokens), complete, concurrency, prompt=MERGE_PROMPT
+        )
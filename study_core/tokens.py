@@ -0,0 +1,190 @@
+"""Fast local token estimates, token-aware chunking and prompt budgeting.
+
+There is no tokenizer dependency: for English prose GPT tokens average about
+four characters or three quarters of a word, and taking the larger of the two
+estimates keeps us on the safe side for code, formulas and short words.
+"""
+import math
+import os
+import re
+import threading
+
+_WORD_RE = re.compile(r"\S+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_SPACES_RE = re.compile(r"(?<=\S)[ \t\f\v\u00a0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Context windows by model-name prefix (longest match wins); LLM_CONTEXT_TOKENS overrides.
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 16385
+# Chat formatting overhead per message and per reply (role markers etc.).
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    words = len(_WORD_RE.findall(text))
+    return math.ceil(max(len(text) / 4, words * 4 / 3))
+
+
+def _split_oversized(piece: str, max_tokens: int) -> list:
+    """Split a paragraph that is too big on its own: by sentence, then by word.
+
+    Words are packed while both halves of ``estimate_tokens`` (characters and
+    words) stay within ``max_tokens``; a word longer than that is cut.
+    """
+    out = []
+    max_chars = max_tokens * 4
+    for sentence in _SENTENCE_RE.split(piece):
+        if estimate_tokens(sentence) <= max_tokens:
+            out.append(sentence)
+            continue
+        words, chars = [], -1
+        for word in sentence.split():
+            for start in range(0, len(word), max_chars):
+                part = word[start:start + max_chars]
+                if words and (chars + 1 + len(part) > max_chars or (len(words) + 1) * 4 > max_tokens * 3):
+                    out.append(" ".join(words))
+                    words, chars = [], -1
+                words.append(part)
+                chars += 1 + len(part)
+        if words:
+            out.append(" ".join(words))
+    return out
+
+
+def chunk_text(text: str, max_tokens: int) -> list:
+    """Pack paragraphs into chunks of at most ``max_tokens`` estimated tokens."""
+    pieces = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_split_oversized(paragraph, max_tokens))
+
+    # Sizes are tracked as characters and words, so the estimate of the joined
+    # chunk (separators included) is exact rather than a sum of rounded parts.
+    chunks, current, chars, words = [], [], 0, 0
+    for piece in pieces:
+        piece_words = len(_WORD_RE.findall(piece))
+        joined = chars + 2 + len(piece) if current else len(piece)
+        if current and max(joined / 4, (words + piece_words) * 4 / 3) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, words, joined = [], 0, len(piece)
+        current.append(piece)
+        chars = joined
+        words += piece_words
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def context_window(model: str) -> int:
+    override = os.getenv("LLM_CONTEXT_TOKENS")
+    if override:
+        return int(override)
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+def message_tokens(messages: list) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
+
+
+def squeeze_whitespace(text: str) -> str:
+    """Collapse runs of spaces inside lines and runs of blank lines.
+
+    Leading indentation and paragraph breaks are kept (indentation matters in
+    code); trailing whitespace is dropped.
+    """
+    text = "\n".join(_SPACES_RE.sub(" ", line).rstrip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip("\n")
+
+
+def drop_repeated_paragraphs(text: str) -> str:
+    """Keep the first copy of each paragraph (e.g. page headers and footers in PDFs)."""
+    seen, kept = set(), []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        if paragraph not in seen:
+            seen.add(paragraph)
+            kept.append(paragraph)
+    return "\n\n".join(kept)
+
+
+def fit_to_budget(text: str, max_tokens: int):
+    """Shrink ``text`` to at most ``max_tokens`` estimated tokens.
+
+    Text that already fits is returned unchanged. Otherwise whitespace is
+    squeezed first; repeated paragraphs are dropped and the text is cut at a
+    paragraph or sentence boundary only when still needed. Returns
+    ``(text, notes)`` with a short note for each step that changed the text.
+    """
+    notes = []
+    if estimate_tokens(text) <= max_tokens:
+        return text, notes
+    squeezed = squeeze_whitespace(text)
+    if squeezed != text:
+        notes.append("squeezed whitespace")
+        text = squeezed
+        if estimate_tokens(text) <= max_tokens:
+            return text, notes
+    deduped = drop_repeated_paragraphs(text)
+    if len(deduped) < len(text):
+        notes.append("removed repeated paragraphs")
+        text = deduped
+    before = estimate_tokens(text)
+    if before > max_tokens:
+        text = (chunk_text(text, max_tokens) or [""])[0] if max_tokens > 0 else ""
+        # The boundary cut can still overshoot (a run of text with no breaks);
+        # the character cut below cannot.
+        text = trim_to_tokens(text, max_tokens)
+        notes.append(f"kept the first ~{estimate_tokens(text):,} of ~{before:,} tokens")
+    return text, notes
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of ``text`` estimated at no more than ``max_tokens`` tokens."""
+    cut = min(len(text), max(0, max_tokens) * 4)
+    while cut and estimate_tokens(text[:cut]) > max_tokens:
+        # Short words make the word count the larger estimate; shrink in proportion.
+        cut = min(cut - 1, cut * max_tokens // estimate_tokens(text[:cut]))
+    return text[:cut]
+
+
+class TokenMeter:
+    """Thread-safe running totals of estimated prompt and completion tokens."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def add(self, other: "TokenMeter"):
+        totals = other.snapshot()
+        with self._lock:
+            self.calls += totals["calls"]
+            self.prompt_tokens += totals["prompt_tokens"]
+            self.completion_tokens += totals["completion_tokens"]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
@@ -0,0 +1,596 @@
+"""Theme stylesheets.
+
+``LIGHT_CSS`` and ``DARK_CSS`` are the sources. ``python theme.py`` compiles
+them into one minified file, ``static/theme.css``, with each theme's rules
+scoped under a class on ``<html>`` (``theme-light`` / ``theme-dark``) through
+``:where()``, which leaves every selector's specificity as it was. The browser
+fetches that file once; switching themes only flips the class. Re-run the
+build after editing either theme.
+"""
+import os
+import re
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "theme.css")
+
+LIGHT_CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap');
+
+html, body, [class*="css"] {
+    font-family: 'Poppins', sans-serif;
+}
+.block-container {
+    padding-top: 1.5rem !important;
+    padding-bottom: 1.5rem !important;
+}
+.app-shell {
+    max-width: 1180px;
+    margin: 0 auto;
+}
+
+/* Light theme placeholders */
+.stTextArea textarea::placeholder,
+.stTextInput input::placeholder {
+    color: #9ca3af !important;   /* soft gray */
+    opacity: 1 !important;
+}
+
+
+/* Topbar */
+.topbar {
+    background: #ffffff;
+    border-radius: 18px;
+    padding: 0.85rem 1.4rem;
+    border: 1px solid rgba(148,163,184,0.28);
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    box-shadow: 0 14px 38px rgba(15,23,42,0.06);
+    margin-bottom: 1.6rem;
+}
+.brand {
+    display: flex;
+    gap: .7rem;
+    align-items: center;
+}
+.brand-icon {
+    width: 28px;
+    height: 28px;
+    border-radius: 9px;
+    background: linear-gradient(135deg,#4f46e5,#22c55e);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: #ffffff;
+    font-size: 16px;
+}
+.brand-title {
+    font-weight: 700;
+    font-size: 1.05rem;
+    color: #111827;
+}
+.brand-sub {
+    font-size: .7rem;
+    color: #9ca3af;
+}
+
+.nav-links {
+    display: flex;
+    gap: .4rem;
+    align-items: center;
+}
+.nav-pill {
+    padding: .3rem .85rem;
+    border-radius: 999px;
+    font-size: .72rem;
+    color: #6b7280;
+    background: transparent;
+    border: 1px solid transparent;
+    cursor: pointer;
+}
+.nav-pill:hover {
+    color: #4f46e5;
+    border-color: rgba(79,70,229,0.18);
+    background: rgba(249,250,251,0.9);
+}
+.nav-pill.active {
+    color: #4f46e5;
+    background: #eef2ff;
+    border-color: rgba(79,70,229,0.35);
+    font-weight: 600;
+}
+
+/* Hero */
+.hero-title {
+    font-size: 2.2rem;
+    font-weight: 700;
+    letter-spacing: -0.01em;
+    background: linear-gradient(120deg,#4f46e5 0%,#7c3aed 40%,#f97316 100%);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    margin-bottom: .15rem;
+}
+.hero-sub {
+    font-size: .9rem;
+    color: #6b7280;
+    max-width: 520px;
+}
+
+/* Cards */
+.input-card,
+.side-card,
+.result-card {
+    background: #ffffff;
+    border-radius: 18px;
+    border: 1px solid rgba(226,232,240,0.95);
+    box-shadow: 0 10px 26px rgba(15,23,42,0.03);
+}
+.input-card {
+    padding: 1rem 1rem .9rem;
+}
+.side-card {
+    padding: .85rem .9rem .9rem;
+    margin-bottom: .8rem;
+}
+.result-card {
+    padding: 1rem 1rem 1.25rem;
+    margin-top: .5rem;
+}
+
+/* File uploader */
+[data-testid="stFileUploader"] section {
+    border-radius: 14px;
+    border: 1px dashed rgba(148,163,184,0.6);
+    background: #f9fafb;
+}
+
+/* Text area */
+.stTextArea textarea {
+    border-radius: 14px !important;
+    border: 1px solid #e5e7eb !important;
+    font-size: .85rem !important;
+    background: #f9fafb !important;
+    padding: .7rem .8rem !important;
+}
+.stTextArea textarea:focus {
+    border-color: #4f46e5 !important;
+    box-shadow: 0 0 0 1px rgba(79,70,229,0.12);
+    background: #ffffff !important;
+}
+
+/* Buttons */
+.stButton button {
+    border-radius: 999px !important;
+    font-weight: 600 !important;
+    font-size: .78rem !important;
+    padding: 0.35rem 0.4rem !important;
+    border: none !important;
+    background: linear-gradient(135deg,#4f46e5,#7c3aed) !important;
+    color: #ffffff !important;
+    box-shadow: 0 9px 22px rgba(79,70,229,0.25);
+    transition: all .18s ease-in-out;
+}
+.stButton button:hover {
+    transform: translateY(-1px);
+    box-shadow: 0 14px 30px rgba(79,70,229,0.32);
+}
+.stButton button:active {
+    transform: translateY(1px);
+    box-shadow: 0 6px 16px rgba(79,70,229,0.2);
+}
+
+/* Badges & history */
+.badge {
+    display: inline-flex;
+    align-items: center;
+    gap: .25rem;
+    padding: .22rem .7rem;
+    border-radius: 999px;
+    background: rgba(79,70,229,0.06);
+    color: #4338ca;
+    font-size: .7rem;
+    font-weight: 600;
+    margin-bottom: .4rem;
+}
+.stat-grid {
+    display: grid;
+    grid-template-columns: repeat(2, minmax(0,1fr));
+    gap: .5rem;
+}
+.stat-item {
+    padding: .5rem .55rem;
+    border-radius: 12px;
+    border: 1px solid rgba(229,231,235,1);
+    background: linear-gradient(180deg,#ffffff,#f9fafb);
+}
+.stat-title {
+    font-size: .6rem;
+    color: #9ca3af;
+}
+.stat-value {
+    font-size: 1.05rem;
+    font-weight: 700;
+    color: #111827;
+}
+.history-item {
+    padding: .45rem .5rem;
+    border-radius: 10px;
+    background: #f9fafb;
+    border: 1px solid rgba(229,231,235,1);
+    margin-bottom: .34rem;
+}
+.history-type {
+    font-size: .7rem;
+    font-weight: 600;
+    color: #111827;
+}
+.history-time {
+    font-size: .6rem;
+    color: #9ca3af;
+}
+.history-tag {
+    font-size: .58rem;
+    color: #6b7280;
+    font-style: italic;
+}
+
+/* Footer */
+.footer {
+    text-align: center;
+    color: #9ca3af;
+    font-size: .7rem;
+    padding-top: 1.2rem;
+}
+
+/* Anim */
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(4px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+</style>
+"""
+
+DARK_CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap');
+
+:root {
+    color-scheme: dark;
+}
+
+html, body, [class*="css"] {
+    font-family: 'Poppins', sans-serif;
+}
+
+/* Core backgrounds */
+.stApp {
+    background-color: #020817 !important;
+}
+[data-testid="stAppViewContainer"] {
+    background: radial-gradient(circle at top,#020817,#020817) !important;
+}
+.block-container {
+    padding-top: 1.5rem !important;
+    padding-bottom: 1.5rem !important;
+}
+.app-shell {
+    max-width: 1180px;
+    margin: 0 auto;
+}
+
+/* Dark theme placeholders */
+.stTextArea textarea::placeholder,
+.stTextInput input::placeholder {
+    color: #6b7280 !important;   /* visible but subtle */
+    opacity: 1 !important;
+}
+
+/* File uploader helper text */
+[data-testid="stFileUploader"] *::placeholder {
+    color: #6b7280 !important;
+}
+
+
+/* Sidebar */
+[data-testid="stSidebar"] {
+    background: #020817 !important;
+    box-shadow: 4px 0 26px rgba(0,0,0,0.55);
+    border-right: 1px solid #111827;
+}
+[data-testid="stSidebar"] * {
+    color: #e5e7eb !important;
+}
+
+/* Topbar */
+.topbar {
+    background: radial-gradient(circle at top left,#0b1020,#020817);
+    border-radius: 18px;
+    padding: 0.85rem 1.4rem;
+    border: 1px solid rgba(75,85,99,0.9);
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    box-shadow: 0 18px 40px rgba(0,0,0,0.9);
+    margin-bottom: 1.6rem;
+}
+.brand {
+    display: flex;
+    gap: .7rem;
+    align-items: center;
+}
+.brand-icon {
+    width: 28px;
+    height: 28px;
+    border-radius: 9px;
+    background: linear-gradient(135deg,#4f46e5,#22c55e);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: #ffffff;
+    font-size: 16px;
+}
+.brand-title {
+    font-weight: 700;
+    font-size: 1.05rem;
+    color: #e5e7eb;
+}
+.brand-sub {
+    font-size: .7rem;
+    color: #9ca3af;
+}
+.nav-links {
+    display: flex;
+    gap: .4rem;
+    align-items: center;
+}
+.nav-pill {
+    padding: .3rem .85rem;
+    border-radius: 999px;
+    font-size: .72rem;
+    color: #9ca3af;
+    background: transparent;
+    border: 1px solid transparent;
+    cursor: pointer;
+}
+.nav-pill:hover {
+    color: #c7d2fe;
+    border-color: rgba(79,70,229,0.4);
+    background: #020817;
+}
+.nav-pill.active {
+    color: #e5e7eb;
+    background: #111827;
+    border-color: rgba(79,70,229,0.7);
+    font-weight: 600;
+}
+
+/* Hero */
+.hero-title {
+    font-size: 2.2rem;
+    font-weight: 700;
+    letter-spacing: -0.01em;
+    background: linear-gradient(120deg,#60a5fa 0%,#a855f7 40%,#f97316 100%);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    margin-bottom: .15rem;
+}
+.hero-sub {
+    font-size: .9rem;
+    color: #9ca3af;
+    max-width: 520px;
+}
+
+/* Cards */
+.input-card,
+.side-card,
+.result-card {
+    background: #050815;
+    border-radius: 18px;
+    border: 1px solid #111827;
+    box-shadow: 0 18px 45px rgba(0,0,0,0.9);
+}
+.input-card {
+    padding: 1rem 1rem .9rem;
+}
+.side-card {
+    padding: .85rem .9rem .9rem;
+    margin-bottom: .8rem;
+}
+.result-card {
+    padding: 1rem 1rem 1.25rem;
+    margin-top: .5rem;
+}
+
+/* File uploader */
+[data-testid="stFileUploader"] section {
+    border-radius: 14px;
+    border: 1px dashed rgba(148,163,184,0.7);
+    background: #020817;
+    color: #9ca3af;
+}
+
+/* Text area & inputs */
+.stTextArea textarea,
+.stTextInput input {
+    border-radius: 14px !important;
+    border: 1px solid #374151 !important;
+    font-size: .85rem !important;
+    background: #020817 !important;
+    color: #e5e7eb !important;
+    padding: .7rem .8rem !important;
+}
+.stTextArea textarea:focus,
+.stTextInput input:focus {
+    border-color: #6366f1 !important;
+    box-shadow: 0 0 0 1px rgba(99,102,241,0.35);
+}
+
+/* Selects, sliders, captions */
+.stSelectbox div,
+.stCaption,
+.stMarkdown,
+label {
+    color: #e5e7eb !important;
+}
+.stSlider > div[data-baseweb="slider"] > div {
+    background-color: #111827 !important;
+}
+
+/* Buttons */
+.stButton button {
+    border-radius: 999px !important;
+    font-weight: 600 !important;
+    font-size: .78rem !important;
+    padding: 0.35rem 0.4rem !important;
+    border: none !important;
+    background: linear-gradient(135deg,#4f46e5,#7c3aed) !important;
+    color: #ffffff !important;
+    box-shadow: 0 18px 55px rgba(0,0,0,1);
+    transition: all .18s ease-in-out;
+}
+.stButton button:hover {
+    transform: translateY(-1px);
+    box-shadow: 0 24px 70px rgba(0,0,0,1);
+}
+.stButton button:active {
+    transform: translateY(1px);
+    box-shadow: 0 10px 30px rgba(0,0,0,1);
+}
+
+/* Badges & stats */
+.badge {
+    display: inline-flex;
+    align-items: center;
+    gap: .25rem;
+    padding: .22rem .7rem;
+    border-radius: 999px;
+    background: rgba(79,70,229,0.25);
+    color: #e5e7eb;
+    font-size: .7rem;
+    font-weight: 600;
+    margin-bottom: .4rem;
+}
+.stat-grid {
+    display: grid;
+    grid-template-columns: repeat(2, minmax(0,1fr));
+    gap: .5rem;
+}
+.stat-item {
+    padding: .5rem .55rem;
+    border-radius: 12px;
+    border: 1px solid #111827;
+    background: radial-gradient(circle at top,#111827,#020817);
+}
+.stat-title {
+    font-size: .6rem;
+    color: #9ca3af;
+}
+.stat-value {
+    font-size: 1.05rem;
+    font-weight: 700;
+    color: #e5e7eb;
+}
+
+/* History */
+.history-item {
+    padding: .45rem .5rem;
+    border-radius: 10px;
+    background: #020817;
+    border: 1px solid #111827;
+    margin-bottom: .34rem;
+}
+.history-type {
+    font-size: .7rem;
+    font-weight: 600;
+    color: #e5e7eb;
+}
+.history-time {
+    font-size: .6rem;
+    color: #6b7280;
+}
+.history-tag {
+    font-size: .58rem;
+    color: #9ca3af;
+    font-style: italic;
+}
+
+/* Footer */
+.footer {
+    text-align: center;
+    color: #6b7280;
+    font-size: .7rem;
+    padding-top: 1.2rem;
+}
+
+/* Anim */
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(4px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+</style>
+"""
+
+THEME_CSS = {"light": LIGHT_CSS, "dark": DARK_CSS}
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_STYLE_TAG_RE = re.compile(r"</?style>")
+_IMPORT_RE = re.compile(r"@import\s+(?:url\([^)]*\)|\"[^\"]*\"|'[^']*')[^;]*;")
+# Whitespace that can go: around punctuation in declarations, around combinators in selectors.
+_DECLARATION_SPACE_RE = re.compile(r"\s*([{}:;,])\s*")
+_SELECTOR_SPACE_RE = re.compile(r"\s*([,>+~])\s*")
+
+
+def _rules(css: str) -> list:
+    """Top-level ``(prelude, body)`` pairs of a stylesheet without comments or @import."""
+    rules, depth, start, body_start = [], 0, 0, 0
+    for i, ch in enumerate(css):
+        if ch == "{":
+            if depth == 0:
+                body_start = i + 1
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:body_start - 1].strip(), css[body_start:i]))
+                start = i + 1
+    return rules
+
+
+def _minify_body(body: str) -> str:
+    return _DECLARATION_SPACE_RE.sub(r"\1", " ".join(body.split())).rstrip(";").replace(";}", "}")
+
+
+def _minify_selector(selector: str) -> str:
+    return _SELECTOR_SPACE_RE.sub(r"\1", " ".join(selector.split()))
+
+
+def _scope(selector: str, theme: str) -> str:
+    scope = f":where(.theme-{theme})"
+    if selector in ("html", ":root"):
+        return selector + scope
+    return f"{scope} {selector}"
+
+
+def build_stylesheet() -> str:
+    """Both themes as one minified stylesheet, each scoped to its ``<html>`` class."""
+    imports, keyframes, rules = [], {}, []
+    for theme, source in THEME_CSS.items():
+        css = _COMMENT_RE.sub("", _STYLE_TAG_RE.sub("", source))
+        imports += [i for i in _IMPORT_RE.findall(css) if i not in imports]
+        for prelude, body in _rules(_IMPORT_RE.sub("", css)):
+            if prelude.startswith("@keyframes"):
+                # Animations are global; both themes must agree on each one.
+                if keyframes.setdefault(prelude, _minify_body(body)) != _minify_body(body):
+                    raise ValueError(f"{prelude} differs between themes")
+                continue
+            selectors = ",".join(_scope(_minify_selector(s), theme) for s in prelude.split(","))
+            rules.append(f"{selectors}{{{_minify_body(body)}}}")
+    rules += [f"{_minify_selector(prelude)}{{{body}}}" for prelude, body in keyframes.items()]
+    return "".join(imports) + "".join(rules)
+
+
+if __name__ == "__main__":
+    os.makedirs(os.path.dirname(STYLESHEET_PATH), exist_ok=True)
+    with open(STYLESHEET_PATH, "w", encoding="utf-8") as f:
+        f.write(build_stylesheet() + "\n")
+    print(f"wrote {STYLESHEET_PATH} ({os.path.getsize(STYLESHEET_PATH):,} bytes)")